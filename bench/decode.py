@@ -0,0 +1,64 @@
+"""Compare the CPU time spent decoding the Petkit API responses of one refresh per JSON decoder.
+
+Run from the repository root, e.g.:
+
+    python -m bench.decode --devices 50 --records 200 --data24 288
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from custom_components.petkit.api import util
+
+from .fake_cloud import FakePetkitCloud
+
+async def build_bodies(cloud: FakePetkitCloud) -> list[bytes]:
+    """Response bodies of a refresh that fetches every device detail"""
+    bodies = [(await cloud._device_roster(None)).body]
+    for device in cloud._devices:
+        typ = device['type'].lower()
+        request = SimpleNamespace(query={'id': device['data']['id']})
+        if typ == 'p3':
+            rsp = await cloud._device_all_data(request)
+        else:
+            rsp = await cloud._device_detail(request)
+        bodies.append(rsp.body)
+        if typ in ['t3', 't4']:
+            bodies.append((await cloud._device_record(request)).body)
+    return bodies
+
+def measure(decoder, bodies: list[bytes], rounds: int) -> float:
+    """Mean CPU seconds to decode all bodies once"""
+    start = time.process_time()
+    for _ in range(rounds):
+        for body in bodies:
+            decoder(body)
+    return (time.process_time() - start) / rounds
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--records', type=int, default=200, help='litter records per getDeviceRecord response')
+    parser.add_argument('--data24', type=int, default=288, help='entries of the p3 data24 array')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    cloud = FakePetkitCloud(devices=args.devices, latency=0, records=args.records, data24=args.data24)
+    bodies = await build_bodies(cloud)
+
+    decoders = {'json': json.loads}
+    if util.orjson is not None:
+        decoders['orjson'] = util.orjson.loads
+
+    print(f'{len(bodies)} responses, {sum(len(b) for b in bodies)} bytes per refresh')
+    baseline = None
+    for name, decoder in decoders.items():
+        cpu = measure(decoder, bodies, args.rounds)
+        baseline = baseline or cpu
+        print(f'{name:>8}: {cpu * 1000:8.2f} ms CPU per refresh ({baseline / cpu:.1f}x)')
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,237 @@
+"""Local stand-in for the Petkit cloud, used to benchmark the integration offline."""
+
+import asyncio
+from collections import Counter
+from datetime import datetime
+import random
+import time
+from typing import Optional
+
+from aiohttp import web
+
+#device types the stand-in hands out, in order
+DEVICE_TYPES = ['d3', 'd4', 'd4s', 'feeder', 'w5', 't3', 't4', 'p3']
+
+class FakePetkitCloud:
+    """Serves the Petkit endpoints used by the integration with configurable latency, errors and payload sizes"""
+
+    def __init__(
+        self,
+        devices: int = 5,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        http_error_rate: float = 0.0,
+        change_rate: float = 0.1,
+        records: int = 20,
+        data24: int = 24,
+        events: bool = True,
+        event_interval: float = 0,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.change_rate = change_rate
+        self.records = records
+        self.data24 = data24
+        self.events = events
+        self.event_interval = event_interval
+        self.requests = Counter()
+        self.bytes_sent = 0
+
+        self._random = random.Random(seed)
+        self._devices = [self._build_device(i) for i in range(devices)]
+        self._runner: Optional[web.AppRunner] = None
+        self._event_log: list[tuple[int, int]] = []
+        self._event_seq = 0
+        self._event_cond: Optional[asyncio.Condition] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counters(self):
+        self.requests.clear()
+        self.bytes_sent = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/latest/user/login', self._login)
+        app.router.add_get('/latest/discovery/device_roster', self._device_roster)
+        app.router.add_get('/latest/discovery/device_events', self._device_events)
+        app.router.add_get('/latest/{type}/device_detail', self._device_detail)
+        app.router.add_get('/latest/{type}/getDeviceRecord', self._device_record)
+        app.router.add_get('/latest/{type}/deviceAllData', self._device_all_data)
+        app.router.add_route('*', '/latest/{type}/{command}', self._control)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving, returns the API base url"""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self._event_cond = asyncio.Condition()
+        if self.event_interval > 0:
+            self._ticker = asyncio.ensure_future(self._tick())
+        return f'http://{host}:{port}/latest/'
+
+    async def stop(self):
+        if self._ticker:
+            self._ticker.cancel()
+            self._ticker = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _build_device(self, index: int) -> dict:
+        typ = DEVICE_TYPES[index % len(DEVICE_TYPES)]
+        data = {
+            'id': 100000 + index,
+            'name': f'{typ.upper()} {index}',
+            'state': 1,
+            'desc': '',
+            'deviceShared': None,
+            'status': {},
+        }
+        if typ in ['t3', 't4']:
+            data['status'] = {'power': 1, 'boxFull': False, 'sandPercent': 80, 'liquid': 60}
+        elif typ == 'w5':
+            data['status'] = {'runStatus': 1, 'powerStatus': 1}
+            data['filterPercent'] = 90
+            data['filterExpectedDays'] = 20
+        elif typ == 'p3':
+            data['syncTime'] = int(time.time())
+            data['battery'] = 80
+        else:
+            data['status'] = {'food': 1, 'desiccantLeftDays': 10, 'weight': 30}
+            if typ == 'feeder':
+                data['dailyFeed'] = {'amount': 60, 'realAmount': 40}
+        return {'type': typ.upper(), 'data': data}
+
+    def _change_devices(self):
+        #some devices report a new state
+        for device in self._devices:
+            if self._random.random() < self.change_rate:
+                device['data']['status'] = {**device['data']['status'], 'tick': time.time()}
+                self._publish(device['data']['id'])
+
+    def _publish(self, device_id):
+        self._event_seq += 1
+        self._event_log.append((self._event_seq, device_id))
+        if self._event_cond:
+            asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._event_cond:
+            self._event_cond.notify_all()
+
+    async def _tick(self):
+        #devices change on their own, not only when the roster is polled
+        while True:
+            await asyncio.sleep(self.event_interval)
+            self._change_devices()
+
+    def _find(self, device_id) -> dict:
+        return next(
+            (d['data'] for d in self._devices if str(d['data']['id']) == str(device_id)),
+            {}
+        )
+
+    async def _respond(self, endpoint: str, result) -> web.Response:
+        self.requests[endpoint] += 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.http_error_rate:
+            #what a proxy in front of the API answers while it is overloaded
+            rsp = web.Response(status=502, text='<html>502 Bad Gateway</html>', content_type='text/html')
+        elif self._random.random() < self.error_rate:
+            rsp = web.json_response({'error': {'code': 99, 'msg': 'simulated failure'}})
+        else:
+            rsp = web.json_response({'result': result})
+        self.bytes_sent += len(rsp.body)
+        return rsp
+
+    async def _login(self, request: web.Request) -> web.Response:
+        return await self._respond('user/login', {
+            'session': {
+                'id': f'fake-{self._random.getrandbits(64):x}',
+                'userId': '1',
+                'createdAt': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                'expiresIn': 86400,
+            }
+        })
+
+    async def _device_roster(self, request: web.Request) -> web.Response:
+        if not self._ticker:
+            self._change_devices()
+        return await self._respond('discovery/device_roster', {'devices': self._devices})
+
+    async def _device_events(self, request: web.Request) -> web.Response:
+        """Long poll, answers once there are events past the cursor or the timeout passed"""
+        if not self.events:
+            raise web.HTTPNotFound()
+        cursor = int(request.query.get('cursor', self._event_seq))
+        timeout = float(request.query.get('timeout', 55))
+        try:
+            async with self._event_cond:
+                await asyncio.wait_for(
+                    self._event_cond.wait_for(lambda: self._event_seq > cursor), timeout
+                )
+        except asyncio.TimeoutError:
+            pass
+        events = [{'deviceId': id} for seq, id in self._event_log if seq > cursor]
+        return await self._respond('discovery/device_events', {'cursor': self._event_seq, 'events': events})
+
+    async def _device_detail(self, request: web.Request) -> web.Response:
+        data = self._find(request.query.get('id'))
+        return await self._respond('{type}/device_detail', {
+            'id': data.get('id'),
+            'sn': f"SN{data.get('id')}",
+            'mac': '00:00:00:00:00:00',
+            'firmware': '1.0.0',
+            'inTimes': self.records,
+            'settings': {'manualLock': 0},
+            'state': {
+                'feedState': {
+                    'times': 2,
+                    'realAmountTotal': 40,
+                    'realAmountTotal1': 20,
+                    'realAmountTotal2': 20,
+                    'eatAmountTotal': 25,
+                    'eatTimes': [int(time.time())] * 3,
+                    'feedTimes': [int(time.time())] * 2,
+                },
+            },
+        })
+
+    async def _device_record(self, request: web.Request) -> web.Response:
+        now = int(time.time())
+        records = [
+            {
+                'timestamp': now - (self.records - i) * 60,
+                'eventType': 10 if i % 2 else 5,
+                'content': {'petWeight': 4200 + i} if i % 2 else {'result': 0},
+            }
+            for i in range(self.records)
+        ]
+        return await self._respond('{type}/getDeviceRecord', records)
+
+    async def _device_all_data(self, request: web.Request) -> web.Response:
+        return await self._respond('{type}/deviceAllData', {
+            'data24': [{'hour': i % 24, 'activity': i, 'calorie': i} for i in range(self.data24)],
+            'activityRecord': {'total': 1200},
+            'calorieRecord': {'total': 300},
+            'sleepDetail': {'total': 600},
+        })
+
+    async def _control(self, request: web.Request) -> web.Response:
+        device_id = request.query.get('id')
+        if device_id is not None:
+            self._publish(int(device_id))
+        return await self._respond('{type}/' + request.match_info['command'], 'success')
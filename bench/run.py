@@ -0,0 +1,168 @@
+"""Benchmark the Petkit coordinator, account and devices against the local stand-in cloud.
+
+Run from the repository root with Home Assistant installed, e.g.:
+
+    python -m bench.run --devices 5 50 500 --refreshes 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from homeassistant.const import CONF_PASSWORD, CONF_REGION, CONF_SCAN_INTERVAL, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+
+from custom_components.petkit.api import PetkitAccount
+from custom_components.petkit.const import CONF_MAX_PARALLEL, CONF_TIMEOUT
+from custom_components.petkit.update_coordinator import PetkitUpdateCoordinator
+
+from .fake_cloud import FakePetkitCloud
+
+class _WriteCounter:
+    """Counts entity state writes instead of sending them to the state machine"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        #not bound to the entity, it replaces the method on the class
+        self.count += 1
+
+def _create_hass(config_dir: str) -> HomeAssistant:
+    try:
+        return HomeAssistant(config_dir)
+    except TypeError:
+        #older Home Assistant releases take no arguments
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+        return hass
+
+async def run_scenario(args, devices: int) -> dict:
+    cloud = FakePetkitCloud(
+        devices=devices,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        http_error_rate=args.http_error_rate,
+        change_rate=args.change_rate,
+        records=args.records,
+        data24=args.data24,
+    )
+    base_url = await cloud.start()
+
+    writes = _WriteCounter()
+    write_ha_state = Entity.async_write_ha_state
+    Entity.async_write_ha_state = writes
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = _create_hass(config_dir)
+        entry = SimpleNamespace(
+            entry_id=f'bench-{devices}',
+            data={CONF_USERNAME: 'bench', CONF_PASSWORD: 'bench', CONF_REGION: 'US'},
+            options={
+                CONF_SCAN_INTERVAL: args.scan_interval,
+                CONF_TIMEOUT: args.timeout,
+                CONF_MAX_PARALLEL: args.max_parallel,
+            },
+        )
+        #measure through the pooled session of the region, without any request budget
+        coordinator = PetkitUpdateCoordinator(hass, entry)
+        session = coordinator._session
+        try:
+            coordinator._api = PetkitAccount(session, 'bench', 'bench', 'US', api_base_url=base_url, rate_limits={})
+
+            #the first refresh only builds the devices
+            await coordinator.async_refresh()
+            coordinator._initialized = True
+            entities = [e for dvc in coordinator.devices.values() for e in dvc.entities]
+
+            #entities are woken through the per-device dispatch of the coordinator, as in async_setup
+            unsubs = [coordinator.async_add_listener(coordinator._async_dispatch_updates)]
+            for entity in entities:
+                unsubs.append(async_dispatcher_connect(
+                    hass, coordinator.device_signal(entity._device.id), entity._handle_device_update
+                ))
+            cloud.reset_counters()
+
+            durations = []
+            tracemalloc.start()
+            for _ in range(args.refreshes):
+                if args.force_detail:
+                    #as if every device was due
+                    coordinator._next_detail_update.clear()
+                    coordinator._last_detail_update.clear()
+                start = time.perf_counter()
+                await coordinator.async_refresh()
+                durations.append(time.perf_counter() - start)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            for unsub in unsubs:
+                unsub()
+        finally:
+            Entity.async_write_ha_state = write_ha_state
+            await coordinator._scheduler.async_release(entry.entry_id, 'US')
+            await cloud.stop()
+
+    return {
+        'devices': devices,
+        'entities': len(entities),
+        'refreshes': args.refreshes,
+        'refresh_mean_s': statistics.mean(durations),
+        'refresh_max_s': max(durations),
+        'requests': cloud.request_count,
+        'requests_per_endpoint': dict(cloud.requests),
+        'bytes_received': cloud.bytes_sent,
+        'alloc_peak_kib': peak / 1024,
+        'entity_writes': writes.count,
+        'suppressed_writes': coordinator.suppressed_writes,
+    }
+
+def _print_table(results: list[dict]):
+    columns = [
+        ('devices', 'd'),
+        ('entities', 'd'),
+        ('refresh_mean_s', '.3f'),
+        ('refresh_max_s', '.3f'),
+        ('requests', 'd'),
+        ('bytes_received', 'd'),
+        ('alloc_peak_kib', '.1f'),
+        ('entity_writes', 'd'),
+        ('suppressed_writes', 'd'),
+    ]
+    print(' '.join(name for name, _ in columns))
+    for result in results:
+        print(' '.join(f'{result[name]:>{len(name)}{spec}}' for name, spec in columns))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[5, 50, 500])
+    parser.add_argument('--refreshes', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra seconds per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of responses that are API errors')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='fraction of responses that are HTTP 502 pages')
+    parser.add_argument('--change-rate', type=float, default=0.1, help='fraction of roster entries changing per poll')
+    parser.add_argument('--records', type=int, default=20, help='litter records per getDeviceRecord response')
+    parser.add_argument('--data24', type=int, default=24, help='entries of the p3 data24 array')
+    parser.add_argument('--scan-interval', type=int, default=30)
+    parser.add_argument('--timeout', type=int, default=60)
+    parser.add_argument('--max-parallel', type=int, default=4)
+    parser.add_argument('--force-detail', action='store_true', help='fetch every device detail on every refresh')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = [await run_scenario(args, devices) for devices in args.devices]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,14 +1,98 @@
 """Support for Petkit devices."""
 import logging
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from .const import DOMAIN
+from homeassistant.const import ATTR_DEVICE_ID
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.storage import Store
+from .const import (
+    DOMAIN,
+    HISTORY_RETENTION_DAYS,
+    SERVICE_GET_ATTRIBUTES,
+    SERVICE_GET_HISTORY,
+    SERVICE_REFRESH_DEVICE,
+    STORAGE_KEY_CACHE,
+    STORAGE_KEY_SESSION,
+    STORAGE_VERSION
+)
+from .history import PERIODS, PetkitHistory
 from .update_coordinator import PetkitUpdateCoordinator
 
 _LOGGER = logging.getLogger(__name__)
 
+REFRESH_DEVICE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string])
+    }
+)
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+        vol.Optional("metric"): cv.string,
+        vol.Optional("period", default="day"): vol.In(list(PERIODS)),
+        vol.Optional("days", default=7): vol.All(vol.Coerce(int), vol.Range(min=1, max=HISTORY_RETENTION_DAYS)),
+    }
+)
+
+GET_ATTRIBUTES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+    }
+)
+
+def _find_petkit_devices(hass: HomeAssistant, device_id: str):
+    """(coordinator, petkit device id) pairs of a device registry id"""
+    device = dr.async_get(hass).async_get(device_id)
+    if device is None:
+        _LOGGER.warning("Unknown device %s", device_id)
+        return []
+    petkit_ids = {id for domain, id in device.identifiers if domain == DOMAIN}
+    return [
+        (coordinator, id)
+        for coordinator in hass.data.get(DOMAIN, {}).values()
+        for id in coordinator.devices
+        if str(id) in petkit_ids
+    ]
+
 async def async_setup(hass: HomeAssistant, config: dict):
+    async def async_refresh_device(call: ServiceCall):
+        """Refresh the given devices without polling the rest of the account."""
+        for device_id in call.data[ATTR_DEVICE_ID]:
+            for coordinator, id in _find_petkit_devices(hass, device_id):
+                await coordinator.async_refresh_device(id)
+
+    async def async_get_history(call: ServiceCall) -> ServiceResponse:
+        """Daily or weekly aggregates of the metric history of a device."""
+        metrics = {}
+        for coordinator, id in _find_petkit_devices(hass, call.data[ATTR_DEVICE_ID]):
+            history = coordinator.history
+            for metric in [call.data["metric"]] if "metric" in call.data else history.metrics(id):
+                metrics[metric] = history.query(id, metric, call.data["period"], call.data["days"])
+        return {"period": call.data["period"], "metrics": metrics}
+
+    async def async_get_attributes(call: ServiceCall) -> ServiceResponse:
+        """The full attributes of the entities of a device, including what the attribute budget trims."""
+        entities = {}
+        for coordinator, id in _find_petkit_devices(hass, call.data[ATTR_DEVICE_ID]):
+            for entity in coordinator.devices[id].entities:
+                if attrs := entity.full_attributes():
+                    entities[entity.entity_id or entity.unique_id] = attrs
+        return {"entities": entities}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH_DEVICE, async_refresh_device, schema=REFRESH_DEVICE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_HISTORY, async_get_history,
+        schema=GET_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_ATTRIBUTES, async_get_attributes,
+        schema=GET_ATTRIBUTES_SCHEMA, supports_response=SupportsResponse.ONLY
+    )
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
@@ -19,7 +103,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     coordinator = PetkitUpdateCoordinator(hass, entry)
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
-    if not await coordinator.async_setup():
+    try:
+        ok = await coordinator.async_setup()
+    except BaseException:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        raise
+    if not ok:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
         return False
 
     return True
@@ -33,6 +123,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     return ok
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Remove the cached data, session and history of a config entry."""
+    #the entry is unloaded by now, which flushed its pending saves
+    for key in [STORAGE_KEY_CACHE, STORAGE_KEY_SESSION]:
+        await Store(hass, STORAGE_VERSION, key.format(entry_id=entry.entry_id)).async_remove()
+    await PetkitHistory(hass, entry.entry_id).async_remove()
+
 async def async_update_options(hass: HomeAssistant, config_entry: ConfigEntry):
     """Update options."""
     await hass.config_entries.async_reload(config_entry.entry_id)
@@ -1,3 +1,5 @@
 from .account import PetkitAccount
 from .exceptions import *
-from .const import *
\ No newline at end of file
+from .const import *
+from .models import FeedState, FitData, LitterRecord, RosterEntry
+from .util import json_loads, summarize_payload
@@ -1,37 +1,90 @@
 from sys import exc_info
 import aiohttp
+import asyncio
 from datetime import datetime, timedelta
 import logging
 import hashlib
+import random
+import time
+from typing import Callable, Dict, Optional, Tuple
 
 from asyncio import TimeoutError
-from aiohttp import ClientConnectorError, ContentTypeError, ClientError
+from aiohttp import ClientConnectionError, ClientError, ClientPayloadError
 
+from .breaker import CircuitBreaker
 from .const import (
     DEFAULT_API_BASE, 
     DEVICE_ROSTER_ENDPOINT, 
+    LOGIN_BACKOFF_BASE,
+    LOGIN_BACKOFF_MAX,
     LOGIN_ENDPOINT, 
     PETKIT_API_VERSION, 
-    REGION_URI_MAPPING
+    REGION_URI_MAPPING,
+    REQUEST_RETRIES,
+    REQUEST_TIMEOUT,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    SESSION_EXPIRY_MARGIN,
+    SESSION_RENEW_BEFORE
 )
 from .exceptions import *
+from .metrics import ApiMetrics
+from .ratelimit import RateLimiter, TokenBucket, endpoint_class
+from .util import json_loads, summarize_payload
 
 _LOGGER = logging.getLogger(__name__)
 
+class _TransientResponseError(Exception):
+    """A server error or an unreadable body, the next attempt may well succeed"""
+
+    def __init__(self, message: str, error: str):
+        super().__init__(message)
+        self.error = error
+
 class PetkitAccount:
-    def __init__(self, session: aiohttp.ClientSession, username: str, password: str, region: str):
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        username: str,
+        password: str,
+        region: str,
+        api_base_url: str = None,
+        json_decoder: Callable[[bytes], object] = None,
+        rate_limiter: TokenBucket = None,
+        rate_limits: Dict[str, Tuple[float, float]] = None,
+        circuit_breaker: CircuitBreaker = None
+    ):
         self._username = username
         self._password = password
         self._password_md5 = hashlib.md5(f'{password}'.encode()).hexdigest()
         self._region = region
         self._session = session
-        self._api_base_url = REGION_URI_MAPPING.get(region,DEFAULT_API_BASE)
+        self._api_base_url = api_base_url or REGION_URI_MAPPING.get(region,DEFAULT_API_BASE)
+        #usually shared by the accounts of the region, see PetkitScheduler
+        self._breaker = circuit_breaker or CircuitBreaker(self._api_base_url)
+        self.metrics = ApiMetrics()
+        self._json_loads = json_decoder or json_loads
+        #per endpoint class of this account, then the budget shared by the region
+        self._rate_limiter = RateLimiter(username, rate_limits, shared=rate_limiter)
+
+        self._timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        self._static_headers = self._build_static_headers()
+        self._headers = None
 
         self._user_id = None
         self._token = None
         self._expiration_date = None
         self._cache = []
 
+        #a single login is in flight at any time, failures back off for everyone
+        self._login_task: Optional[asyncio.Future] = None
+        self._login_failures = 0
+        self._login_retry_at = 0.0
+        self._login_error: Optional[PetkitAuthFailedError] = None
+
+        #called whenever a new session is obtained, e.g. to persist it
+        self.on_session_changed: Optional[Callable[[], None]] = None
+
     @property
     def user_id(self):
         return self._user_id
@@ -46,7 +99,45 @@ class PetkitAccount:
 
     @property
     def is_authorized(self):
-        return self._expiration_date > datetime.utcnow()
+        return self._expiration_date is not None and self._expiration_date > datetime.utcnow()
+
+    @property
+    def renew_at(self) -> Optional[datetime]:
+        """UTC time at which the session should be renewed in the background"""
+        if self._expiration_date is None:
+            return None
+        return self._expiration_date - SESSION_RENEW_BEFORE
+
+    @property
+    def session_data(self) -> dict:
+        """The current session, in a form that can be persisted and restored"""
+        if not self._token or self._expiration_date is None:
+            return {}
+        return {
+            'username': self._username,
+            'id': self._token,
+            'user_id': self._user_id,
+            'expires_at': self._expiration_date.isoformat(),
+        }
+
+    def restore_session(self, data: Optional[dict]) -> bool:
+        """Reuse a persisted session, unless it belongs to another user or has expired"""
+        try:
+            if data['username'] != self._username:
+                return False
+            token = data['id']
+            expiration = datetime.fromisoformat(data['expires_at'])
+        except (TypeError, KeyError, ValueError):
+            return False
+
+        if expiration <= datetime.utcnow() + SESSION_EXPIRY_MARGIN:
+            return False
+
+        self._token = token
+        self._user_id = data.get('user_id')
+        self._expiration_date = expiration
+        _LOGGER.debug("Restored Petkit session expiring at %s", expiration)
+        return True
 
     def _get_full_uri(self, endpoint=''):
         if endpoint[:6] == 'https:' or endpoint[:5] == 'http:':
@@ -57,14 +148,17 @@ class PetkitAccount:
 
     async def request(self, api: str, pms=None, method='GET', **kwargs):
         await self._ensure_token()
+        token = self._token
         rsp = await self._request(api, pms, method, **kwargs)
 
         #try again if the request failed due to an auth issue
         eno = rsp.get('error', {}).get('code', 0)
         if eno in [5, 8]:
             try:
-                await self.async_login()
-                rsp = await self._request(api)
+                #somebody else may already have logged in while this request was in flight
+                if self._token == token:
+                    await self.async_login()
+                rsp = await self._request(api, pms, method, **kwargs)
             except PetkitAuthFailedError as exc:
                 _LOGGER.error('Request failed due to authentication error.', exc_info=exc)
                 raise
@@ -72,10 +166,10 @@ class PetkitAccount:
         return rsp
 
     async def _ensure_token(self) -> None:
-        cdt = datetime.now()
-        if (self._token or self._expiration_date) is None:
+        #sessions are renewed ahead of time in the background, only log in here if it actually expired
+        if self._token is None or self._expiration_date is None:
             await self.async_login()
-        elif (self._expiration_date-cdt).total_seconds() < 3600:
+        elif self._expiration_date <= datetime.utcnow() + SESSION_EXPIRY_MARGIN:
             await self.async_login()
         else:
             return None
@@ -84,8 +178,17 @@ class PetkitAccount:
         method = method.upper()
         url = self._get_full_uri(api)
 
+        if not self._breaker.allow_request():
+            self.metrics.record(api, 0, error='circuit_open')
+            raise PetkitCircuitOpenError(f'Petkit API is unavailable, skipped {method} {api}')
+
+        #only idempotent requests are safe to send again, control commands are sent as GET too
+        #and one that timed out may already have reached the device
+        idempotent = method in ['GET'] and endpoint_class(api) != 'control'
+        attempts = 1 + REQUEST_RETRIES if idempotent else 1
+
         kws = {
-            'timeout': 30,
+            'timeout': self._timeout,
             'headers': self._get_custom_headers(),
         }
 
@@ -98,26 +201,58 @@ class PetkitAccount:
             kws['params'] = pms
         else:
             kws['data'] = pms
-            kws['headers']['Content-Type'] = 'application/x-www-form-urlencoded'
-        req = None
+            #the cached headers are shared between requests, never modify them
+            kws['headers'] = {**kws['headers'], 'Content-Type': 'application/x-www-form-urlencoded'}
 
-        try:
-            req = await self._session.request(method, url, **kws)
-            return await req.json() or {}
-        except (ClientConnectorError, ContentTypeError, TimeoutError) as exc:
-            lgs = [method, url, pms, exc]
-            if req:
-                lgs.extend([req.status, req.content])
-            _LOGGER.error('Petkit API failed to connect: %s', lgs, exc_info=exc)
-        except ClientError as exc:
-            lgs = [method, url, pms, exc]
-            if req:
-                lgs.extend([req.status, req.content])       
-            _LOGGER.error('Petkit API error: %s', lgs, exc_info=exc)
-            raise PetkitServerError(exc_info=exc)
+        for attempt in range(attempts):
+            req = None
+            wait = await self._rate_limiter.acquire(api)
+            start = time.monotonic()
+            try:
+                req = await self._session.request(method, url, **kws)
+                body = await req.read()
+                if req.status == 404:
+                    self.metrics.record(api, time.monotonic() - start, len(body), 'http_404', wait)
+                    raise PetkitEndpointNotFoundError(f'Petkit API has no {method} {api}')
+                if req.status >= 500:
+                    raise _TransientResponseError(f'HTTP {req.status}', f'http_{req.status}')
+                try:
+                    rsp = (self._json_loads(body) if body else None) or {}
+                except ValueError as exc:
+                    raise _TransientResponseError(f'invalid response: {exc}', 'invalid_response') from exc
+                self._breaker.record_success()
+                self.metrics.record(api, time.monotonic() - start, len(body), self._get_error_code(req, rsp), wait)
+                return rsp
+            except (ClientConnectionError, ClientPayloadError, TimeoutError, _TransientResponseError) as exc:
+                #includes keep-alive connections the server already closed, e.g. ServerDisconnectedError
+                self._breaker.record_failure()
+                error = exc.error if isinstance(exc, _TransientResponseError) else 'connection'
+                self.metrics.record(api, time.monotonic() - start, error=error, wait=wait)
+                if attempt + 1 < attempts and not self._breaker.is_open:
+                    delay = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+                    _LOGGER.debug('Petkit API request failed, retrying %s in %.2fs: %s', api, delay, exc)
+                    await asyncio.sleep(delay)
+                    continue
+                _LOGGER.error('Petkit API request failed: %s', [method, url, pms, exc])
+                raise PetkitConnectionError(f'Petkit API request failed: {exc}') from exc
+            except ClientError as exc:
+                self.metrics.record(api, time.monotonic() - start, error='client_error', wait=wait)
+                lgs = [method, url, pms, exc]
+                if req:
+                    lgs.extend([req.status, req.content])       
+                _LOGGER.error('Petkit API error: %s', lgs, exc_info=exc)
+                raise PetkitServerError(f'Petkit API error: {exc}') from exc
         return {}
 
-    def _get_custom_headers(self):
+    @staticmethod
+    def _get_error_code(req, rsp):
+        if req.status >= 400:
+            return f'http_{req.status}'
+        if isinstance(rsp, dict):
+            return (rsp.get('error') or {}).get('code')
+        return None
+
+    def _build_static_headers(self):
         #should be able to set the local and tz, but for now
         #that isn't implemented assume everywhere but china
         #would use english
@@ -131,10 +266,46 @@ class PetkitAccount:
                 'X-Timezone': '0',
                 'X-TimezoneId': 'Etc/UTC',
                 'X-Img-Version': '1',
-                'X-Session': f'{self.token}',
             }
 
+    def _get_custom_headers(self):
+        #only rebuilt when the session token changes
+        session = f'{self.token}'
+        if self._headers is None or self._headers['X-Session'] != session:
+            self._headers = {**self._static_headers, 'X-Session': session}
+        return self._headers
+
     async def async_login(self):
+        """Log in, sharing a single in-flight login between all concurrent callers"""
+        if self._login_task is None or self._login_task.done():
+            if time.monotonic() < self._login_retry_at:
+                raise PetkitAuthFailedError(
+                    f'Petkit login for "{self._username}" is backing off after {self._login_failures} failures'
+                ) from self._login_error
+            self._login_task = asyncio.ensure_future(self._async_login())
+
+        #shield the shared login from the cancellation of any single caller
+        await asyncio.shield(self._login_task)
+
+    async def _async_login(self):
+        try:
+            await self._async_do_login()
+        except PetkitAuthFailedError as err:
+            self._login_failures += 1
+            self._login_error = err
+            self._login_retry_at = time.monotonic() + min(
+                LOGIN_BACKOFF_MAX, LOGIN_BACKOFF_BASE * 2 ** (self._login_failures - 1)
+            )
+            raise
+
+        self._login_failures = 0
+        self._login_error = None
+        self._login_retry_at = 0.0
+
+        if self.on_session_changed:
+            self.on_session_changed()
+
+    async def _async_do_login(self):
         pms = {
             'encrypt': 1,
             'username': self._username,
@@ -157,11 +328,10 @@ class PetkitAccount:
             )
             self._user_id = session["userId"]
 
-            _LOGGER.debug(
-                "Obtained access token {} and expiration datetime {}".format(
-                    self._token, self._expiration_date
-                )
-            )        
+            _LOGGER.debug("Obtained access token and expiration datetime %s", self._expiration_date)
+        except PetkitConnectionError:
+            #not an authentication failure, the API could not be reached
+            raise
         except Exception as err:
             raise PetkitAuthFailedError(f'Petkit login for "{self._username}" failed: {response}')
 
@@ -171,6 +341,9 @@ class PetkitAccount:
 
         self._cache = rsp.get('result', {}).get('devices') or []
         if not self._cache:
-            _LOGGER.warning(f'Could not retrieve Petkit device information: {self.username}, response={rsp}')
+            _LOGGER.warning(
+                'Could not retrieve Petkit device information: %s, response=%s',
+                self._username, summarize_payload(rsp)
+            )
 
         return self._cache
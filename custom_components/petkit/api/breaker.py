@@ -0,0 +1,63 @@
+import logging
+import time
+from typing import Optional
+
+from .const import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Short-circuits requests to an API region after repeated connection failures
+
+    Once the reset timeout passed, a single trial request is let through at a time,
+    its outcome closes the circuit again or keeps it open for another timeout.
+    """
+
+    def __init__(self, name: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self._name = name
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are paused or only trial requests are let through"""
+        return self._opened_at is not None
+
+    def allow_request(self) -> bool:
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self._reset_timeout:
+            return False
+        #a trial whose outcome was never recorded does not block the next one forever
+        if self._probe_at is not None and now - self._probe_at < self._reset_timeout:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            _LOGGER.info("Petkit API at %s is reachable again", self._name)
+        self._failures = 0
+        self._opened_at = None
+        self._probe_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._threshold:
+            if self._opened_at is None:
+                _LOGGER.warning(
+                    "Petkit API at %s failed %s times in a row, pausing requests for %s seconds",
+                    self._name, self._failures, self._reset_timeout
+                )
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+
+    def as_dict(self) -> dict:
+        return {
+            'failures': self._failures,
+            'open': self.is_open,
+        }
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 DEFAULT_API_BASE = 'https://api.petkit.cn/latest/'
 REGION_URI_MAPPING = {
     "US": "https://api.petkt.com/latest/",
@@ -7,4 +9,43 @@ REGION_URI_MAPPING = {
 
 PETKIT_API_VERSION = "8.29.2"
 LOGIN_ENDPOINT = "user/login"
-DEVICE_ROSTER_ENDPOINT = "discovery/device_roster"
\ No newline at end of file
+DEVICE_ROSTER_ENDPOINT = "discovery/device_roster"
+
+#sessions are renewed in the background this long before they expire
+SESSION_RENEW_BEFORE = timedelta(hours=1)
+#sessions this close to expiry are renewed inline before a request
+SESSION_EXPIRY_MARGIN = timedelta(minutes=1)
+#failed logins back off exponentially from the base up to the max (seconds)
+LOGIN_BACKOFF_BASE = 30
+LOGIN_BACKOFF_MAX = 900
+
+#idempotent requests are retried with jittered exponential backoff (seconds)
+REQUEST_RETRIES = 2
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 5
+#consecutive connection failures that open the circuit of a region, and for how long (seconds)
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 60
+
+#total seconds a single request may take
+REQUEST_TIMEOUT = 30
+#connections kept per region, enough for the largest parallel detail fan-out plus commands
+HTTP_POOL_LIMIT = 20
+#seconds an idle connection is kept open, and resolved addresses are cached
+HTTP_KEEPALIVE_TIMEOUT = 60
+HTTP_DNS_CACHE_TTL = 300
+#requests per second, and burst size, allowed per region endpoint across all accounts
+REGION_RATE_LIMIT = 5
+REGION_RATE_BURST = 10
+#requests per second, and burst size, per endpoint class of an account
+ENDPOINT_RATE_LIMITS = {
+    'login': (0.2, 2),
+    'roster': (1, 2),
+    'detail': (4, 8),
+    'records': (2, 4),
+    'control': (2, 4),
+}
+
+#long-poll endpoint for device change notifications, and how long (seconds) the server may hold a poll open
+EVENTS_ENDPOINT = "discovery/device_events"
+EVENTS_LONG_POLL_TIMEOUT = 55
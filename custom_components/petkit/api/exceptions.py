@@ -9,4 +9,16 @@ class PetkitAuthFailedError(PetkitError):
 
 class PetkitServerError(PetkitError):
     """Error raised when there is a server error (not 4xx http code)"""
-    pass
\ No newline at end of file
+    pass
+
+class PetkitConnectionError(PetkitError):
+    """Error raised when the API could not be reached"""
+    pass
+
+class PetkitCircuitOpenError(PetkitConnectionError):
+    """Error raised when requests are paused because the API keeps failing"""
+    pass
+
+class PetkitEndpointNotFoundError(PetkitError):
+    """Error raised when the API does not offer the requested endpoint"""
+    pass
@@ -0,0 +1,87 @@
+from collections import Counter
+import math
+from typing import Any, Dict, Optional, Union
+
+from .const import DEVICE_ROSTER_ENDPOINT, EVENTS_ENDPOINT, LOGIN_ENDPOINT
+
+#upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+def endpoint_template(api: str) -> str:
+    """Group device endpoints by template, e.g. 't4/device_detail' becomes '{type}/device_detail'"""
+    if api in [LOGIN_ENDPOINT, DEVICE_ROSTER_ENDPOINT, EVENTS_ENDPOINT]:
+        return api
+    _, sep, endpoint = api.partition('/')
+    return f'{{type}}/{endpoint}' if sep else api
+
+class EndpointStats:
+    """Request count, latency histogram, rate limit queue wait, payload bytes and error codes of one endpoint"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = Counter()
+        self.bytes = 0
+        self.last_bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, latency: float, size: int, error: Optional[Union[int, str]] = None, wait: float = 0.0):
+        self.count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.bytes += size
+        self.last_bytes = size
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_buckets[i] += 1
+                break
+        if error:
+            self.errors[str(error)] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'latency_mean': self.latency_total / self.count if self.count else None,
+            'latency_max': self.latency_max,
+            'latency_histogram': {
+                f'le_{bound}': n for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets)
+            },
+            'queue_wait_mean': self.wait_total / self.count if self.count else None,
+            'queue_wait_max': self.wait_max,
+            'errors': dict(self.errors),
+        }
+
+class ApiMetrics:
+    """Per-endpoint request metrics of an account"""
+
+    def __init__(self):
+        self._endpoints: Dict[str, EndpointStats] = {}
+
+    @property
+    def total_requests(self) -> int:
+        return sum(stats.count for stats in self._endpoints.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(stats.bytes for stats in self._endpoints.values())
+
+    def get(self, api: str) -> Optional[EndpointStats]:
+        return self._endpoints.get(endpoint_template(api))
+
+    def record(self, api: str, latency: float, size: int = 0, error: Optional[Union[int, str]] = None, wait: float = 0.0):
+        template = endpoint_template(api)
+        if template not in self._endpoints:
+            self._endpoints[template] = EndpointStats()
+        self._endpoints[template].record(latency, size, error, wait)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            template: stats.as_dict()
+            for template, stats in sorted(self._endpoints.items())
+        }
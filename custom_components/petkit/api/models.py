@@ -0,0 +1,140 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+#(model, field) pairs whose drift has been reported, so a changed schema only logs once
+_reported_drift = set()
+
+def _report_drift(model: str, field: str, message: str, *args):
+    if (model, field) in _reported_drift:
+        return
+    _reported_drift.add((model, field))
+    _LOGGER.warning('Petkit payload schema drift in %s.%s: ' + message, model, field, *args)
+
+def _coerce(val, typ):
+    """Convert numbers sent as floats or strings, and ids sent as numbers, raises ValueError otherwise"""
+    types = typ if isinstance(typ, tuple) else (typ,)
+    if isinstance(val, str) and (int in types or float in types):
+        num = float(val)
+    elif isinstance(val, (int, float)) and not isinstance(val, bool):
+        if str in types:
+            return str(val)
+        num = val
+    else:
+        raise ValueError(f'cannot convert {type(val).__name__}')
+
+    if int in types and float(num).is_integer():
+        return int(num)
+    if float in types:
+        return float(num)
+    raise ValueError(f'{val!r} is not a whole number')
+
+class PetkitModel:
+    """Compact, slotted view of an API payload, parsed once per response
+
+    Known keys become typed attributes, anything else is kept in `extra` so
+    nothing the API sends is lost when the model is turned back into a dict.
+    Values of the wrong type are converted where that is safe, otherwise the
+    field is None and the raw value stays in `extra`.
+    """
+    #attribute name -> (payload key, expected type)
+    FIELDS: Dict[str, Tuple[str, Any]] = {}
+    __slots__ = ('extra',)
+
+    def __init__(self, **kwargs):
+        for name in self.FIELDS:
+            setattr(self, name, kwargs.get(name))
+        self.extra = kwargs.get('extra')
+
+    @classmethod
+    def parse(cls, data: Optional[dict]):
+        model = cls.__name__
+        if data is None:
+            return cls()
+        if not isinstance(data, dict):
+            _report_drift(model, '*', 'expected an object, got %s', type(data).__name__)
+            return cls()
+
+        values = {}
+        keys = set()
+        for name, (key, typ) in cls.FIELDS.items():
+            val = data.get(key)
+            if val is not None and not isinstance(val, typ):
+                try:
+                    val = _coerce(val, typ)
+                except (TypeError, ValueError):
+                    _report_drift(model, name, 'expected %s, got %r', typ, val)
+                    #keep the raw value, it is only missing from the typed field
+                    values[name] = None
+                    continue
+            keys.add(key)
+            values[name] = val
+        extra = {k: v for k, v in data.items() if k not in keys}
+        return cls(**values, extra=extra or None)
+
+    def get(self, name: str, default=None):
+        val = getattr(self, name, None)
+        return default if val is None else val
+
+    def as_dict(self) -> dict:
+        """Payload form of the model, as the API sent it"""
+        dat = {
+            key: getattr(self, name)
+            for name, (key, _) in self.FIELDS.items()
+            if getattr(self, name) is not None
+        }
+        if self.extra:
+            dat.update(self.extra)
+        return dat
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.as_dict()!r})'
+
+_NUMBER = (int, float)
+
+class RosterEntry(PetkitModel):
+    FIELDS = {
+        'id': ('id', int),
+        'name': ('name', str),
+        'type': ('type', str),
+        'state': ('state', (int, str)),
+        'desc': ('desc', str),
+        'shared': ('deviceShared', object),
+        'status': ('status', dict),
+        'battery': ('battery', _NUMBER),
+        'sync_time': ('syncTime', _NUMBER),
+        'filter_percent': ('filterPercent', _NUMBER),
+        'filter_expected_days': ('filterExpectedDays', _NUMBER),
+        'daily_feed': ('dailyFeed', dict),
+    }
+    __slots__ = tuple(FIELDS)
+
+class FeedState(PetkitModel):
+    FIELDS = {
+        'times': ('times', int),
+        'real_amount_total': ('realAmountTotal', _NUMBER),
+        'real_amount_total1': ('realAmountTotal1', _NUMBER),
+        'real_amount_total2': ('realAmountTotal2', _NUMBER),
+        'eat_amount_total': ('eatAmountTotal', _NUMBER),
+        'eat_times': ('eatTimes', list),
+        'feed_times': ('feedTimes', list),
+    }
+    __slots__ = tuple(FIELDS)
+
+class LitterRecord(PetkitModel):
+    FIELDS = {
+        'timestamp': ('timestamp', int),
+        'event_type': ('eventType', int),
+        'content': ('content', dict),
+    }
+    __slots__ = tuple(FIELDS)
+
+class FitData(PetkitModel):
+    FIELDS = {
+        'data24': ('data24', list),
+        'activity_record': ('activityRecord', dict),
+        'calorie_record': ('calorieRecord', dict),
+        'sleep_detail': ('sleepDetail', dict),
+    }
+    __slots__ = tuple(FIELDS)
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from .const import DEVICE_ROSTER_ENDPOINT, ENDPOINT_RATE_LIMITS, EVENTS_ENDPOINT, LOGIN_ENDPOINT
+
+_LOGGER = logging.getLogger(__name__)
+
+#endpoint classes that jump the queue ahead of background polling
+PRIORITY_CLASSES = ['control', 'login']
+
+def endpoint_class(api: str) -> str:
+    """Rate limit class of an endpoint: login, roster, events, detail, records or control"""
+    if api == LOGIN_ENDPOINT:
+        return 'login'
+    if api == DEVICE_ROSTER_ENDPOINT:
+        return 'roster'
+    if api == EVENTS_ENDPOINT:
+        #a single long poll at a time, held open by the server
+        return 'events'
+    endpoint = api.rpartition('/')[2]
+    if endpoint in ['device_detail', 'deviceAllData']:
+        return 'detail'
+    if endpoint == 'getDeviceRecord':
+        return 'records'
+    return 'control'
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._priority_waiters = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: bool = False) -> float:
+        """Wait for a token, returns the seconds spent waiting
+
+        While a priority caller waits, tokens are kept for it and the others keep waiting.
+        """
+        start = time.monotonic()
+        if priority:
+            self._priority_waiters += 1
+        try:
+            while True:
+                self._refill()
+                if self._tokens >= 1 and (priority or not self._priority_waiters):
+                    self._tokens -= 1
+                    return time.monotonic() - start
+                delay = max(1 - self._tokens, 1 if self._tokens >= 1 else 0) / self.rate
+                _LOGGER.debug('Petkit rate limit %s reached, waiting %.2fs', self.name, delay)
+                await asyncio.sleep(delay)
+        finally:
+            if priority:
+                self._priority_waiters -= 1
+
+class RateLimiter:
+    """Token buckets per endpoint class of an account, in front of an optional bucket shared per region"""
+
+    def __init__(
+        self,
+        name: str,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        shared: Optional[TokenBucket] = None
+    ):
+        self._buckets = {
+            cls: TokenBucket(f'{name} {cls}', rate, burst)
+            for cls, (rate, burst) in (ENDPOINT_RATE_LIMITS if limits is None else limits).items()
+        }
+        self._shared = shared
+
+    async def acquire(self, api: str) -> float:
+        """Wait until a request to the endpoint may be sent, returns the seconds spent waiting"""
+        cls = endpoint_class(api)
+        priority = cls in PRIORITY_CLASSES
+        wait = 0.0
+        if bucket := self._buckets.get(cls):
+            wait += await bucket.acquire(priority)
+        if self._shared:
+            wait += await self._shared.acquire(priority)
+        return wait
@@ -0,0 +1,26 @@
+import json
+import reprlib
+
+try:
+    #considerably faster on the large record and data24 payloads, ships with Home Assistant
+    import orjson
+except ImportError:
+    orjson = None
+
+#bounded repr for logging payloads, never renders more than a few levels and items
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 3
+_payload_repr.maxdict = 8
+_payload_repr.maxlist = 8
+_payload_repr.maxstring = 60
+_payload_repr.maxother = 60
+
+def summarize_payload(payload) -> str:
+    """Truncated representation of an API payload, for debug logging"""
+    return _payload_repr.repr(payload)
+
+def json_loads(body):
+    """Decode a JSON response body (bytes or str) with the fastest available library"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
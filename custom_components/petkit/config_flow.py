@@ -14,10 +14,15 @@ import homeassistant.helpers.config_validation as cv
 
 from .api import PetkitAccount, REGION_URI_MAPPING
 from .const import (
+    CONF_ATTRIBUTE_BUDGET,
+    CONF_MAX_PARALLEL,
     CONF_TIMEOUT,
+    DEFAULT_ATTRIBUTE_BUDGET,
+    DEFAULT_MAX_PARALLEL,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_TIMEOUT,
     DOMAIN,
+    VALUES_MAX_PARALLEL,
     VALUES_SCAN_INTERVAL,
     VALUES_TIMEOUT
 )
@@ -33,7 +38,9 @@ CREDENTIALS_SCHEMA = vol.Schema(
 OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.In(VALUES_SCAN_INTERVAL),
-        vol.Required(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): vol.In(VALUES_TIMEOUT)
+        vol.Required(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): vol.In(VALUES_TIMEOUT),
+        vol.Required(CONF_MAX_PARALLEL, default=DEFAULT_MAX_PARALLEL): vol.In(VALUES_MAX_PARALLEL),
+        vol.Required(CONF_ATTRIBUTE_BUDGET, default=DEFAULT_ATTRIBUTE_BUDGET): cv.boolean
     }
 )
 
@@ -3,10 +3,52 @@
 DOMAIN = "petkit"
 MANUFACTURER = "Petkit"
 
+EVENT_LITTER_RECORD = f"{DOMAIN}_litter_record"
+
+SERVICE_REFRESH_DEVICE = "refresh_device"
+SERVICE_GET_HISTORY = "get_history"
+SERVICE_GET_ATTRIBUTES = "get_attributes"
+SIGNAL_DEVICE_UPDATED = f"{DOMAIN}_device_updated_{{entry_id}}_{{device_id}}"
+
+STORAGE_VERSION = 1
+STORAGE_KEY_CACHE = f"{DOMAIN}.{{entry_id}}.cache"
+STORAGE_KEY_SESSION = f"{DOMAIN}.{{entry_id}}.session"
+STORAGE_KEY_HISTORY = f"{DOMAIN}.{{entry_id}}.history"
+#seconds to wait before writing the device cache to disk
+CACHE_SAVE_DELAY = 30
+#seconds to wait after a command before refreshing the device, commands within it share one refresh
+COMMAND_REFRESH_COOLDOWN = 2
+#seconds between roster polls while device events arrive, as a safety net for missed events
+EVENT_MODE_POLL_INTERVAL = 900
+#seconds to wait before reconnecting the event source after it failed
+EVENT_RECONNECT_DELAY = 60
+#seconds to wait before writing the metric history to disk, and how many days of it are kept
+HISTORY_SAVE_DELAY = 300
+HISTORY_RETENTION_DAYS = 90
+#an unchanged metric value is stored again after this many seconds, so every period has samples
+HISTORY_REPEAT_INTERVAL = 3600
+#with the attribute budget on, the JSON size (bytes) of the attributes of an entity
+#is capped, and arrays longer than this are left to the diagnostics and services
+ATTRIBUTE_SIZE_CAP = 1024
+ATTRIBUTE_MAX_ITEMS = 10
+#with debug logging on, a truncated roster payload is logged every this many refreshes
+DEBUG_PAYLOAD_SAMPLE_EVERY = 10
+
 CONF_TIMEOUT = "timeout"
+CONF_MAX_PARALLEL = "max_parallel"
+#not offered by the options flow, the Petkit cloud has no known event endpoint yet
+CONF_EVENT_MODE = "event_mode"
+CONF_ATTRIBUTE_BUDGET = "attribute_budget"
 
 VALUES_SCAN_INTERVAL = [30, 60, 120, 300, 600]
 VALUES_TIMEOUT = [10, 15, 30, 45, 60]
+VALUES_MAX_PARALLEL = [1, 2, 4, 8, 16]
 
 DEFAULT_SCAN_INTERVAL = VALUES_SCAN_INTERVAL[2]
 DEFAULT_TIMEOUT = VALUES_TIMEOUT[2]
+DEFAULT_MAX_PARALLEL = VALUES_MAX_PARALLEL[2]
+DEFAULT_EVENT_MODE = False
+DEFAULT_ATTRIBUTE_BUDGET = False
+
+#hass.data key of the scheduler shared by all config entries
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
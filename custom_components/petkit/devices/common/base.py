@@ -1,15 +1,53 @@
+import asyncio
+import functools
 import logging
+import time
 from typing import List
 
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from ...api import PetkitAccount
-from ...const import DOMAIN
+from ...api import (
+    PetkitAccount,
+    PetkitConnectionError,
+    PetkitEndpointNotFoundError,
+    PetkitServerError,
+    RosterEntry,
+    summarize_payload
+)
+from ...const import COMMAND_REFRESH_COOLDOWN, DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
+def refresh_cached(func):
+    """Memoise a derived value until the coordinator data or the device detail changes"""
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        memo = self._get_memo()
+        key = (func.__name__, args)
+        if key not in memo:
+            memo[key] = func(self, *args)
+        return memo[key]
+    return wrapper
+
 class PetkitDevice:
+    #detail poll cadence (seconds) per activity tier, None uses the configured scan interval,
+    #the active tier only polls faster than the scan interval for devices with DETAIL_SENSORS
+    POLL_INTERVALS = {
+        'active': 30,
+        'idle': None,
+        'offline': 600,
+    }
+    #whether sensors read values only the detail has, they must not lag more than the poll interval
+    DETAIL_SENSORS = False
+    #numeric properties kept in the metric history
+    HISTORY_METRICS = ['battery']
+    #attribute keys kept per entity with the attribute budget on, other entities are only size capped
+    ATTRIBUTE_ALLOWLIST = {
+        'state': ['state', 'desc', 'shared'],
+    }
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         self._coordinator = coordinator
         self._account = account
@@ -20,6 +58,19 @@ class PetkitDevice:
 
         self._detail = {}
         self._entities = {}
+        self._memo = {}
+        self._memo_generation = None
+        self._memo_detail = None
+
+        #commands are sent one at a time, follow-up refreshes of commands and events are coalesced
+        self._command_lock = asyncio.Lock()
+        self._refresh_debouncer = Debouncer(
+            coordinator.hass, _LOGGER,
+            cooldown=COMMAND_REFRESH_COOLDOWN,
+            immediate=False,
+            function=self._async_debounced_refresh
+        )
+        self.last_command_latency: float = None
         self._build_entities_list()        
 
     @property
@@ -34,6 +85,10 @@ class PetkitDevice:
     def name(self):
         return self._name
 
+    @property
+    def detail(self) -> dict:
+        return self._detail
+
     @property
     def serial_number(self):
         return self._detail.get('sn', '')
@@ -47,12 +102,20 @@ class PetkitDevice:
         return self._detail.get('firmware', '')
 
     @property
+    @refresh_cached
+    def roster(self) -> RosterEntry:
+        """Typed view of the roster entry of this device"""
+        return RosterEntry.parse(self._cache)
+
+    @property
+    @refresh_cached
     def status(self):
-        return self._cache.get('status') or {}
+        return self.roster.get('status', {})
 
     @property
+    @refresh_cached
     def state(self):
-        sta = self._cache.get('state') or 0
+        sta = self.roster.get('state', 0)
         dic = {
             '1': 'online',
             '2': 'offline',
@@ -63,17 +126,45 @@ class PetkitDevice:
         }
         return dic.get(f'{sta}'.strip(), sta)
 
+    @property
+    def is_active(self) -> bool:
+        return self.state == 'feeding'
+
+    @property
+    def is_offline(self) -> bool:
+        return self.state == 'offline'
+
+    @property
+    def poll_tier(self) -> str:
+        if self.is_offline:
+            return 'offline'
+        if self.is_active:
+            return 'active'
+        return 'idle'
+
+    def get_poll_interval(self, scan_interval: int) -> int:
+        """Seconds until the detail of this device should be fetched again"""
+        tier = self.poll_tier
+        interval = self.POLL_INTERVALS.get(tier) or scan_interval
+        if tier == 'active':
+            #only sensors reading the detail gain from a faster poll, the others read the roster at the scan interval
+            return min(interval, scan_interval) if self.DETAIL_SENSORS else scan_interval
+        if tier == 'offline':
+            return max(interval, scan_interval)
+        return interval
+
     def state_attrs(self):
+        roster = self.roster
         return {
-            'state': self._cache.get('state'),
-            'desc':  self._cache.get('desc'),
+            'state': roster.state,
+            'desc':  roster.desc,
             'status': self.status,
-            'shared': self._cache.get('deviceShared'),
+            'shared': roster.shared,
         }        
 
     @property
     def battery(self):
-        return self._cache.get('battery')
+        return self.roster.battery
 
     @property
     def coordinator(self):
@@ -97,7 +188,16 @@ class PetkitDevice:
             'sw_version': self.firmware_version
         }
 
+    def _get_memo(self) -> dict:
+        gen = self._coordinator.data_generation
+        if self._memo_generation != gen or self._memo_detail is not self._detail:
+            self._memo = {}
+            self._memo_generation = gen
+            self._memo_detail = self._detail
+        return self._memo
+
     @property
+    @refresh_cached
     def _cache(self) -> dict:
         if self._coordinator.data is None:
             return {}
@@ -121,7 +221,7 @@ class PetkitDevice:
             PetkitSensorEntity
         )
         entities = [
-            PetkitSensorEntity('state', self, { 'icon': 'mdi:information', 'state_attrs': self.state_attrs })
+            PetkitSensorEntity('state', self, { 'icon': 'mdi:information', 'state_attrs': self.state_attrs }),
         ]
         if 'battery' in self._cache:
             entities.extend([
@@ -130,19 +230,82 @@ class PetkitDevice:
 
         return entities
 
+    async def async_send_command(self, api: str, pms: dict, method: str = 'GET') -> dict:
+        """Send a control command, queued behind any command in flight for this device"""
+        async with self._command_lock:
+            start = time.monotonic()
+            rdt = await self._account.request(api, pms, method)
+            self.last_command_latency = time.monotonic() - start
+        _LOGGER.debug('Petkit command %s for %s took %.3fs', api, self.name, self.last_command_latency)
+
+        if not rdt.get('error', {}).get('code', 0):
+            await self.async_request_refresh()
+        return rdt
+
+    async def async_request_refresh(self):
+        """Refresh this device shortly, requests within the cooldown share one refresh"""
+        await self._refresh_debouncer.async_call()
+
+    async def _async_debounced_refresh(self):
+        await self._coordinator.async_refresh_device(self.id)
+
+    def async_cancel_pending(self):
+        """Cancel any scheduled follow-up refresh"""
+        self._refresh_debouncer.async_cancel()
+
+    def history_samples(self) -> list:
+        """(metric, timestamp or None for now, value) samples for the metric history"""
+        return [(metric, None, getattr(self, metric, None)) for metric in self.HISTORY_METRICS]
+
+    def merge_detail_into_roster(self, entry: dict) -> dict:
+        """Roster entry with the status values the detail reports more recently"""
+        state = self._detail.get('state')
+        status = entry.get('status')
+        if not isinstance(state, dict) or not isinstance(status, dict):
+            return entry
+
+        live = {k: v for k, v in state.items() if k in status}
+        if not live:
+            return entry
+        return {**entry, 'status': {**status, **live}}
+
+    def export_state(self) -> dict:
+        """State saved to disk so the device can be restored on startup"""
+        return {
+            'detail': self._detail,
+        }
+
+    def restore_state(self, state: dict):
+        self._detail = state.get('detail') or {}
+
+    async def _async_request_result(self, api: str, pms: dict, what: str = 'detail'):
+        """Request the result of a device endpoint, None if there is none and the last one should be kept"""
+        try:
+            async with self._coordinator.request_slots:
+                rsp = await self._account.request(api, pms)
+        except PetkitConnectionError as exc:
+            _LOGGER.warning('Petkit API unavailable, keeping the last %s of %s: %s', what, self.name, exc)
+            return None
+        except (PetkitEndpointNotFoundError, PetkitServerError) as exc:
+            _LOGGER.error('Got petkit device %s for %s failed: %s', what, self.name, exc)
+            return None
+
+        rdt = rsp.get('result') if isinstance(rsp, dict) else None
+        #an error payload or an empty body, one bad response must not blank the sensors
+        if rdt is None or rdt == {}:
+            _LOGGER.warning(
+                'Got no petkit device %s for %s, keeping the last one: %s', what, self.name, summarize_payload(rsp)
+            )
+            return None
+        return rdt
+
     async def update_device_detail(self):
         api = f'{self.type}/device_detail'
         pms = {
             'id': self.id,
         }
-        rsp = None
-        try:
-            rsp = await self._account.request(api, pms)
-            rdt = rsp.get('result') or {}
-        except (TypeError, ValueError) as exc:
-            rdt = {}
-            _LOGGER.error('Got petkit device detail for %s failed: %s', self.name, exc)
-        if not rdt:
-            _LOGGER.warning('Got petkit device detail for %s failed: %s', self.name, rsp)
+        rdt = await self._async_request_result(api, pms)
+        if rdt is None:
+            return self._detail
         self._detail = rdt
         return rdt
\ No newline at end of file
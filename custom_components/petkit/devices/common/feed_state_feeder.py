@@ -5,26 +5,43 @@ from homeassistant.const import *
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from ...api import PetkitAccount
+from ...api import FeedState, PetkitAccount
+from .base import refresh_cached
 from .feeder import PetkitFeederDevice
 
 _LOGGER = logging.getLogger(__name__)
 
+#feed totals without the eatTimes and feedTimes arrays
+_FEED_STATE_TOTALS = ['times', 'realAmountTotal', 'realAmountTotal1', 'realAmountTotal2', 'eatAmountTotal']
+
 class PetkitFeedStateFeederDevice(PetkitFeederDevice):
+    DETAIL_SENSORS = True
+    ATTRIBUTE_ALLOWLIST = {
+        **PetkitFeederDevice.ATTRIBUTE_ALLOWLIST,
+        'feed_times': _FEED_STATE_TOTALS,
+        'feed_amount': _FEED_STATE_TOTALS,
+        'feed_now': ['feeding_amount', 'feeding_amount1', 'feeding_amount2', 'desc', 'error', *_FEED_STATE_TOTALS],
+    }
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         super().__init__(data, coordinator, account)    
 
     @property
     def feed_times(self):
-        return self.feed_state_attrs().get('times', 0)
+        return self.feed_state.get('times', 0)
 
     @property
     def feed_amount(self):
-        fas = self.feed_state_attrs()
-        return fas.get('realAmountTotal', 0)   
+        return self.feed_state.get('real_amount_total', 0)
+
+    @property
+    @refresh_cached
+    def feed_state(self) -> FeedState:
+        return FeedState.parse((self._detail.get('state') or {}).get('feedState'))
 
+    @refresh_cached
     def feed_state_attrs(self):
-        return self._detail.get('state', {}).get('feedState') or {}
+        return self.feed_state.as_dict()
 
     def _get_all_entities(self) -> List[Entity]:
         #deal with circular imports by bringing in the sensors here
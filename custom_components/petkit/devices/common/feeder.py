@@ -12,6 +12,8 @@ from .base import PetkitDevice
 _LOGGER = logging.getLogger(__name__)
 
 class PetkitFeederDevice(PetkitDevice):
+    HISTORY_METRICS = [*PetkitDevice.HISTORY_METRICS, 'feed_amount', 'feed_times', 'desiccant']
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         from ...entities import PetkitNumberEntity
         self._feed_now_amount_entities: List[PetkitNumberEntity] = []
@@ -49,7 +51,7 @@ class PetkitFeederDevice(PetkitDevice):
     def feed_now_attrs(self):
         return {
             'feeding_amount': self.feed_now_amount,
-            'desc': self._cache.get('desc'),
+            'desc': self.roster.desc,
             'error': self.status.get('errorMsg')
         }
 
@@ -102,14 +104,11 @@ class PetkitFeederDevice(PetkitDevice):
         }
         self._set_feed_now_amount_parameters(pms, **kwargs)
 
-        rdt = await self.account.request(self._feed_now_endpoint, pms, 'POST')
+        rdt = await self.async_send_command(self._feed_now_endpoint, pms, 'POST')
         eno = rdt.get('error', {}).get('code', 0)
         if eno:
             _LOGGER.error('Petkit feeding failed: %s', rdt)
             return False
-            
-        #await self.update_device_detail()
-        await self._coordinator.async_request_refresh()
         
         _LOGGER.info('Petkit feeding now: %s', rdt)  
         return rdt
\ No newline at end of file
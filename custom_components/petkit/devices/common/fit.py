@@ -6,23 +6,41 @@ from homeassistant.const import *
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from ...api import PetkitAccount
-from .base import PetkitDevice
+from ...api import FitData, PetkitAccount
+from .base import PetkitDevice, refresh_cached
 
 _LOGGER = logging.getLogger(__name__)
 
 class PetkitFitDevice(PetkitDevice):
+    #fit trackers only sync a few times a day
+    POLL_INTERVALS = {
+        'active': None,
+        'idle': 1800,
+        'offline': 3600,
+    }
+    DETAIL_SENSORS = True
+    HISTORY_METRICS = [*PetkitDevice.HISTORY_METRICS, 'activity', 'calorie', 'sleep']
+    ATTRIBUTE_ALLOWLIST = {
+        **PetkitDevice.ATTRIBUTE_ALLOWLIST,
+        'state': ['state', 'desc', 'battery', 'syncTime'],
+    }
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         super().__init__(data, coordinator, account)
 
     @property
     def state(self):
-        return self._cache.get('syncTime')
+        return self.roster.sync_time
+
+    @property
+    @refresh_cached
+    def fit_data(self) -> FitData:
+        return FitData.parse(self._detail)
 
     def state_attrs(self):
         return {
             **self._cache,
-            'data24': self._detail.get('data24', []),
+            'data24': self.fit_data.get('data24', []),
         }
 
     @property
@@ -30,21 +48,33 @@ class PetkitFitDevice(PetkitDevice):
         return self.activity_attrs().get('total')
 
     def activity_attrs(self):
-        return self._detail.get('activityRecord') or {}
+        return self.fit_data.get('activity_record', {})
 
     @property
     def calorie(self):
         return self.calorie_attrs().get('total')
 
     def calorie_attrs(self):
-        return self._detail.get('calorieRecord') or {}
+        return self.fit_data.get('calorie_record', {})
 
     @property
     def sleep(self):
         return self.sleep_attrs().get('total')
 
     def sleep_attrs(self):
-        return self._detail.get('sleepDetail') or {}
+        return self.fit_data.get('sleep_detail', {})
+
+    def history_samples(self) -> list:
+        #the completed hours of the day, stored at the hour they belong to
+        now = datetime.datetime.now()
+        day = datetime.datetime.combine(now.date(), datetime.time())
+        hourly = [
+            (metric, int((day + datetime.timedelta(hours=hour['hour'])).timestamp()), hour.get(metric))
+            for hour in self.fit_data.get('data24', [])
+            if isinstance(hour, dict) and isinstance(hour.get('hour'), int) and hour['hour'] < now.hour
+            for metric in ['activity', 'calorie']
+        ]
+        return super().history_samples() + [(f'hourly_{m}', ts, v) for m, ts, v in hourly]
 
     def _get_all_entities(self) -> List[Entity]:
         from ...entities import PetkitSensorEntity
@@ -73,13 +103,8 @@ class PetkitFitDevice(PetkitDevice):
             'deviceId': self.id,
             'day': datetime.datetime.today().strftime('%Y%m%d'),
         }
-        rsp = None
-        try:
-            rsp = await self.account.request(api, pms)
-            rdt = rsp.get('result') or {}
-        except (TypeError, ValueError):
-            rdt = {}
-        if not rdt:
-            _LOGGER.warning('Got petkit device detail for %s failed: %s', self.name, rsp)
+        rdt = await self._async_request_result(api, pms)
+        if rdt is None:
+            return self._detail
         self._detail = rdt
         return rdt
\ No newline at end of file
@@ -1,19 +1,42 @@
-import copy
+import asyncio
+from collections import deque
 import datetime
 import logging
+from types import MappingProxyType
 from typing import List, Dict
 
 from homeassistant.const import *
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from ...api import PetkitAccount
-from .base import PetkitDevice
+from ...api import LitterRecord, PetkitAccount
+from ...const import EVENT_LITTER_RECORD
+from .base import PetkitDevice, refresh_cached
 
 _LOGGER = logging.getLogger(__name__)
 
+#number of records kept in memory per litter box
+MAX_RECORDS = 200
+
 class PetkitLitterDevice(PetkitDevice):
+    POLL_INTERVALS = {
+        'active': 15,
+        'idle': None,
+        'offline': 600,
+    }
+    DETAIL_SENSORS = True
+    HISTORY_METRICS = [*PetkitDevice.HISTORY_METRICS, 'sand_percent', 'liquid', 'in_times']
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
+        self._records = deque(maxlen=MAX_RECORDS)
+        self._records_list = []
+        self._records_high_water = None
+        #(timestamp, eventType) of the dated records in the buffer
+        self._record_keys = set()
+        #a targeted refresh can overlap the scheduled one, records are merged one fetch at a time
+        self._records_lock = asyncio.Lock()
+        self._last_record = MappingProxyType({})
+        self._last_record_by_event: dict[int, MappingProxyType] = {}
         super().__init__(data, coordinator, account)
 
     @property
@@ -46,9 +69,14 @@ class PetkitLitterDevice(PetkitDevice):
         }
 
     @property
+    @refresh_cached
     def work_mode(self):
         return self.status.get('workState', {}).get('workMode', -1)
 
+    @property
+    def is_active(self) -> bool:
+        return self.work_mode != -1
+
     @property
     def action(self):
         return {
@@ -71,7 +99,12 @@ class PetkitLitterDevice(PetkitDevice):
 
     @property
     def records(self):
-        return self.detail.get('records') or []
+        return self._records_list
+
+    @property
+    def records_high_water(self):
+        """Timestamp of the newest record seen so far"""
+        return self._records_high_water
 
     @property
     def last_record(self):
@@ -86,23 +119,94 @@ class PetkitLitterDevice(PetkitDevice):
         return dic.get(evt, evt)
 
     def last_record_attrs(self, only_event=None):
-        rls = copy.deepcopy(self.records)
-        if not rls:
-            return {}
-        lst = rls[-1] or {}
         if only_event:
-            rls.reverse()
-            for v in rls:
-                if only_event == v.get('eventType') and v.get('content'):
-                    lst = v
-                    break
-        ctx = lst.pop('content', None) or {}
-        return {**lst, **ctx}
+            return self._last_record_by_event.get(only_event, self._last_record)
+        return self._last_record
+
+    @property
+    def last_records_by_event(self):
+        """Read-only view of the latest record with content per event type"""
+        return MappingProxyType(self._last_record_by_event)
+
+    @staticmethod
+    def _record_key(rec: LitterRecord):
+        return (rec.timestamp, rec.event_type)
+
+    def _merge_records(self, records) -> List[LitterRecord]:
+        """Append the records not seen yet to the buffer, none older than the high-water mark"""
+        records = records if isinstance(records, list) else []
+        high_water = self._records_high_water or 0
+        parsed = [LitterRecord.parse(rec) for rec in records if rec]
+
+        #records sharing the high-water second can arrive in a later fetch, so compare with >= and
+        #skip the ones already kept, on the first sync this takes whatever the day has so far
+        new = []
+        keys = set(self._record_keys)
+        for rec in sorted((r for r in parsed if r.timestamp is not None), key=lambda r: r.timestamp):
+            key = self._record_key(rec)
+            if rec.timestamp >= high_water and key not in keys:
+                keys.add(key)
+                new.append(rec)
+
+        #records whose timestamp could not be read can not be ordered, keep each once instead of losing them
+        undated = [rec for rec in parsed if rec.timestamp is None]
+        if undated:
+            seen = [r.as_dict() for r in self._records if r.timestamp is None]
+            for rec in undated:
+                dat = rec.as_dict()
+                if dat not in seen:
+                    seen.append(dat)
+                    new.append(rec)
+        if not new:
+            return new
+
+        self._records.extend(new)
+        self._records_list = list(self._records)
+        self._record_keys = {self._record_key(r) for r in self._records if r.timestamp is not None}
+        self._records_high_water = max(
+            high_water, *[rec.timestamp or 0 for rec in new]
+        )
+        self._index_records(new)
+        return new
+
+    def _index_records(self, records: List[LitterRecord]):
+        """Fold newer records into the index of the latest record overall and per event type"""
+        #a record without a timestamp is kept but can not be known to be the latest
+        dated = [rec for rec in records if rec.timestamp is not None]
+        for rec in dated:
+            if rec.content:
+                self._last_record_by_event[rec.event_type] = self._record_view(rec)
+        if dated:
+            self._last_record = self._record_view(dated[-1])
+
+    def _fire_record_events(self, records: list):
+        hass = self._coordinator.hass
+        for rec in records:
+            hass.bus.async_fire(EVENT_LITTER_RECORD, {
+                'device_id': self.id,
+                'device_name': self.name,
+                **self._record_view(rec),
+            })
+
+    @staticmethod
+    def _record_view(rec: LitterRecord) -> MappingProxyType:
+        dat = rec.as_dict()
+        ctx = dat.pop('content', None) or {}
+        return MappingProxyType({**dat, **ctx})
 
     @property
     def manual_lock(self):
         return True if self.detail.get('settings', {}).get('manualLock') else False
 
+    def history_samples(self) -> list:
+        #pet weights at the time they were measured, the history skips those it already has
+        weights = [
+            ('pet_weight', rec.timestamp, rec.content.get('petWeight'))
+            for rec in self._records_list
+            if rec.event_type == 10 and rec.timestamp and rec.content
+        ]
+        return super().history_samples() + weights
+
     def _get_all_entities(self) -> List[Entity]:
         from ...entities import (
             PetkitSensorEntity,
@@ -168,7 +272,6 @@ class PetkitLitterDevice(PetkitDevice):
                 'icon': 'mdi:play-box',
                 'options': list(self._actions.keys()),
                 'async_select': self.async_select_action,
-                'delay_update': 5,
             })
         ]
 
@@ -180,24 +283,47 @@ class PetkitLitterDevice(PetkitDevice):
         pass
 
     async def update_device_detail(self):
-        await super().update_device_detail()
-
+        #detail and records are independent, so fetch them concurrently
+        rdt, _ = await asyncio.gather(
+            super().update_device_detail(),
+            self.update_device_records()
+        )
+        self._detail = {**rdt, 'records': self._records_list}
+        return self._detail
+
+    async def update_device_records(self):
         api = f'{self.type}/getDeviceRecord'
         pms = {
             'deviceId': self.id,
         }
         self._set_device_detail_parameters(pms)
 
-        rsp = None
-        try:
-            rsp = await self.account.request(api, pms)
-            rdt = rsp.get('result') or {}
-        except (TypeError, ValueError):
-            rdt = {}
-        if not rdt:
-            _LOGGER.warning('Got petkit device records for %s failed: %s', self.name, rsp)
-        self.detail['records'] = rdt
-        return rdt
+        async with self._records_lock:
+            rdt = await self._async_request_result(api, pms, 'records')
+            if rdt is None:
+                return []
+            initial = self._records_high_water is None
+            new = self._merge_records(rdt)
+        if new and not initial:
+            self._fire_record_events(new)
+        return new
+
+    def export_state(self) -> dict:
+        return {
+            'detail': {k: v for k, v in self._detail.items() if k != 'records'},
+            'records': [rec.as_dict() for rec in self._records_list],
+            'records_high_water': self._records_high_water,
+        }
+
+    def restore_state(self, state: dict):
+        super().restore_state(state)
+        records = [LitterRecord.parse(rec) for rec in state.get('records') or [] if rec]
+        self._records.extend(records)
+        self._records_list = list(self._records)
+        self._records_high_water = state.get('records_high_water')
+        self._record_keys = {self._record_key(r) for r in self._records if r.timestamp is not None}
+        self._index_records(records)
+        self._detail = {**self._detail, 'records': self._records_list}
 
     async def async_turn_on(self, **kwargs):
         return await self.async_set_power(True)
@@ -252,14 +378,11 @@ class PetkitLitterDevice(PetkitDevice):
             'id': self.id,
             **kwargs,
         }
-        rdt = await self.account.request(api, pms)
+        rdt = await self.async_send_command(api, pms)
         eno = rdt.get('error', {}).get('code', 0)
         if eno:
             _LOGGER.error('Petkit device control failed: %s', [pms, rdt])
             return False
-
-        #await self.update_device_detail()
-        await self._coordinator.async_request_refresh()
         
         _LOGGER.info('Petkit device control: %s', [pms, rdt])
         return rdt
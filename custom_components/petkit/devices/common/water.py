@@ -6,15 +6,23 @@ from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from ...api import PetkitAccount
-from .base import PetkitDevice
+from .base import PetkitDevice, refresh_cached
 
 _LOGGER = logging.getLogger(__name__)
 
 class PetkitWaterDevice(PetkitDevice):
+    #a running pump is the normal state of a fountain and its sensors read the roster, so it polls at the scan interval
+    HISTORY_METRICS = [*PetkitDevice.HISTORY_METRICS, 'filter_level', 'filter_days']
+    ATTRIBUTE_ALLOWLIST = {
+        **PetkitDevice.ATTRIBUTE_ALLOWLIST,
+        'state': ['state', 'desc', 'status', 'filterPercent', 'filterExpectedDays'],
+    }
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         super().__init__(data, coordinator, account)
 
     @property
+    @refresh_cached
     def state(self):
         dat = self.status or {}
         if dat.get('lackWarning'):
@@ -27,16 +35,20 @@ class PetkitWaterDevice(PetkitDevice):
             return 'idle'
         return None
 
+    @property
+    def is_active(self) -> bool:
+        return not not self.status.get('runStatus')
+
     def state_attrs(self):
         return self._cache
 
     @property
     def filter_level(self):
-        return self._cache.get('filterPercent')
+        return self.roster.filter_percent
 
     @property
     def filter_days(self):
-        return self._cache.get('filterExpectedDays')
+        return self.roster.filter_expected_days
 
     def _get_all_entities(self) -> List[Entity]:
         from ...entities import PetkitSensorEntity
@@ -9,17 +9,18 @@ from ..entities import PetkitSensorEntity
 from .common import PetkitFeedStateFeederDevice
 
 class D3FeederDevice(PetkitFeedStateFeederDevice):
+    HISTORY_METRICS = [*PetkitFeedStateFeederDevice.HISTORY_METRICS, 'eat_amount', 'eat_times', 'bowl_weight']
+
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
         super().__init__(data, coordinator, account)    
 
     @property
     def eat_amount(self):
-        return self.feed_state_attrs().get('eatAmountTotal', 0)
+        return self.feed_state.get('eat_amount_total', 0)
 
     @property
     def eat_times(self):
-        times = self.feed_state_attrs().get('eatTimes', [])
-        return len(times)
+        return len(self.feed_state.get('eat_times', []))
 
     @property
     def bowl_weight(self):
@@ -27,8 +28,7 @@ class D3FeederDevice(PetkitFeedStateFeederDevice):
         
     @property
     def feed_times(self):
-        times = self.feed_state_attrs().get('feedTimes', [])
-        return len(times)
+        return len(self.feed_state.get('feed_times', []))
 
     def _get_all_entities(self) -> List[Entity]:
         base_entities = super()._get_all_entities()
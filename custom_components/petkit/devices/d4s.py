@@ -13,8 +13,8 @@ class D4sFeederDevice(PetkitFeedStateFeederDevice):
 
     @property
     def feed_amount(self):
-        fas = self.feed_state_attrs()
-        return fas.get('realAmountTotal1', 0) + fas.get('realAmountTotal2', 0)
+        fas = self.feed_state
+        return fas.get('real_amount_total1', 0) + fas.get('real_amount_total2', 0)
 
     @property
     def feed_now_amount(self):
@@ -24,7 +24,7 @@ class D4sFeederDevice(PetkitFeedStateFeederDevice):
         return {
             'feeding_amount1': self.get_feed_now_amount(0),
             'feeding_amount2': self.get_feed_now_amount(1),
-            'desc': self.data.get('desc'),
+            'desc': self.roster.desc,
             'error': self.status.get('errorMsg'),
             **self.feed_state_attrs(),
         }
@@ -6,6 +6,7 @@ from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from ..api import PetkitAccount
 from .common import PetkitFeederDevice
+from .common.base import refresh_cached
 
 class LegacyFeederDevice(PetkitFeederDevice):
     def __init__(self, data: dict, coordinator: DataUpdateCoordinator, account: PetkitAccount):
@@ -22,8 +23,9 @@ class LegacyFeederDevice(PetkitFeederDevice):
         fas = self.daily_feed_attrs()
         return fas.get('realAmount', 0)           
 
+    @refresh_cached
     def daily_feed_attrs(self):
-        return self._cache.get('dailyFeed') or {}
+        return self.roster.get('daily_feed', {})
 
     def _get_all_entities(self) -> List[Entity]:
         #deal with circular imports by bringing in the sensors here
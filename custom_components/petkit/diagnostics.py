@@ -0,0 +1,34 @@
+"""Diagnostics support for Petkit."""
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .update_coordinator import PetkitUpdateCoordinator
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, 'sn', 'mac', 'secret', 'secretKey'}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: PetkitUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "metrics": coordinator.get_metrics(),
+        "devices": {
+            str(id): async_redact_data(
+                {
+                    "roster": (coordinator.data or {}).get(id),
+                    "detail": dvc.detail,
+                },
+                TO_REDACT
+            )
+            for id, dvc in coordinator.devices.items()
+        },
+    }
@@ -1,20 +1,26 @@
+import json
 import logging
 
 from homeassistant.const import *
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
 
 _LOGGER = logging.getLogger(__name__)
 
+from ..const import ATTRIBUTE_MAX_ITEMS, ATTRIBUTE_SIZE_CAP
 from ..devices import PetkitDevice
 
-class PetkitEntity(CoordinatorEntity):
+class PetkitEntity(Entity):
+    _attr_should_poll = False
+
     def __init__(self, name, device: PetkitDevice, option=None):
-        CoordinatorEntity.__init__(self, device.coordinator)
-        
         self._coordinator = device.coordinator
         self._name = name
         self._device = device
         self._option = option or {}      
+        self._written_snapshot = None
+        self.suppressed_writes = 0
 
         self._attr_name = f'{device.name} {name}'.strip()
         self._attr_device_id = device.id
@@ -22,6 +28,7 @@ class PetkitEntity(CoordinatorEntity):
         self._attr_icon = self._option.get('icon')
         self._attr_device_class = self._option.get('class')
         self._attr_unit_of_measurement = self._option.get('unit')
+        self._attr_entity_category = self._option.get('category')
 
         self._attr_device_info = {
             'identifiers': device.id,
@@ -33,20 +40,83 @@ class PetkitEntity(CoordinatorEntity):
 
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
-        self._handle_coordinator_update()
+        #only woken up when the coordinator reports this device changed
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._coordinator.device_signal(self._device.id), self._handle_device_update
+            )
+        )
+        self._refresh_state()
+
+    @callback
+    def _handle_device_update(self):
+        self._refresh_state()
+
+    @property
+    def available(self):
+        return self._coordinator.last_update_success
 
-    def _handle_coordinator_update(self):
+    async def async_update(self):
+        """Refresh just this device, e.g. from the update_entity service."""
+        await self._coordinator.async_refresh_device(self._device.id)
+
+    def _refresh_state(self):
         self.update()
+        if self._state_snapshot() == self._written_snapshot:
+            self._suppress_write()
+            return
         self.async_write_ha_state()
 
+    def _suppress_write(self):
+        self.suppressed_writes += 1
+        self._coordinator.suppressed_writes += 1
+
+    def _state_snapshot(self):
+        attrs = getattr(self, '_attr_extra_state_attributes', None)
+        return (self.available, self.state, dict(attrs) if attrs else None)
+
+    @callback
+    def async_write_ha_state(self):
+        #remember what was last written, including optimistic writes from the control entities
+        self._written_snapshot = self._state_snapshot()
+        super().async_write_ha_state()
+
     def update(self):
         if hasattr(self._device, self._name):
             self._attr_state = getattr(self._device, self._name)
-            _LOGGER.debug('Petkit entity update: %s', [self.entity_id, self._name, self._attr_state])
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug('Petkit entity update: %s', [self.entity_id, self._name, self._attr_state])
 
         fun = self._option.get('state_attrs')
         if callable(fun):
-            self._attr_extra_state_attributes = fun()
+            attrs = fun()
+            if self._coordinator.attribute_budget:
+                attrs = self._trim_attributes(attrs)
+            self._attr_extra_state_attributes = attrs
+
+    def full_attributes(self) -> dict:
+        """All attributes of the entity, regardless of the attribute budget"""
+        fun = self._option.get('state_attrs')
+        return dict(fun() or {}) if callable(fun) else {}
+
+    def _trim_attributes(self, attrs) -> dict:
+        """Keep the allow-listed keys of the device class, without long arrays and within the size cap"""
+        allow = self._device.ATTRIBUTE_ALLOWLIST.get(self._name)
+        kept = {}
+        size = 0
+        for key, val in (attrs or {}).items():
+            if allow is not None and key not in allow:
+                continue
+            if isinstance(val, (list, tuple)) and len(val) > ATTRIBUTE_MAX_ITEMS:
+                continue
+            val_size = len(json.dumps(val, default=str))
+            if size + val_size > ATTRIBUTE_SIZE_CAP:
+                continue
+            size += val_size
+            kept[key] = val
+        if attrs and len(kept) < len(attrs):
+            self._coordinator.trimmed_attributes += len(attrs) - len(kept)
+        return kept
 
     @property
     def state(self):
@@ -1,5 +1,3 @@
-import asyncio
-
 from homeassistant.components.select import SelectEntity
 
 from ..devices import PetkitDevice
@@ -27,9 +25,7 @@ class PetkitSelectEntity(PetkitEntity, SelectEntity):
             ret = await fun(option, **kws)
 
         if ret:
+            #optimistic until the device refresh that follows the command comes in
             self._attr_current_option = option
             self.async_write_ha_state()
-            if dly := self._option.get('delay_update'):
-                await asyncio.sleep(dly)
-                self._handle_coordinator_update()
         return ret
@@ -1,5 +1,3 @@
-import asyncio
-
 from homeassistant.components.switch import SwitchEntity
 
 from .base import PetkitBinaryEntity
@@ -14,10 +12,9 @@ class PetkitSwitchEntity(PetkitBinaryEntity, SwitchEntity):
             kwargs['entity'] = self
             ret = await fun(**kwargs)
         if ret:
+            #optimistic until the device refresh that follows the command comes in
             self._attr_is_on = not not on
             self.async_write_ha_state()
-            await asyncio.sleep(1)
-            self._handle_coordinator_update()
         return ret
 
     async def async_turn_on(self, **kwargs):
@@ -0,0 +1,128 @@
+"""Sources of device change notifications, so devices do not have to be polled for them"""
+
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+from typing import Callable, Optional
+
+import aiohttp
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .api import (
+    EVENTS_ENDPOINT,
+    EVENTS_LONG_POLL_TIMEOUT,
+    PetkitAccount,
+    PetkitConnectionError,
+    PetkitEndpointNotFoundError,
+    PetkitError
+)
+from .const import EVENT_RECONNECT_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+class PetkitEventSource(ABC):
+    """Reports devices that changed, the coordinator falls back to polling while it is unavailable"""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        on_device_event: Callable[[int], None],
+        on_available_changed: Callable[[bool], None]
+    ):
+        self._hass = hass
+        self._entry = entry
+        self._on_device_event = on_device_event
+        self._on_available_changed = on_available_changed
+        self._available = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        return self._available
+
+    def _set_available(self, available: bool):
+        if available == self._available:
+            return
+        self._available = available
+        if available:
+            _LOGGER.info("Petkit device events connected, polling less often")
+        else:
+            _LOGGER.info("Petkit device events unavailable, falling back to polling")
+        self._on_available_changed(available)
+
+    async def async_start(self):
+        #runs for the lifetime of the entry, not part of its setup
+        self._task = self._entry.async_create_background_task(
+            self._hass, self._async_run(), f"petkit event source {self._entry.entry_id}"
+        )
+
+    async def async_stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._available = False
+
+    @abstractmethod
+    async def _async_run(self):
+        """Report device events until cancelled, or return once the source can not work at all"""
+
+class LongPollEventSource(PetkitEventSource):
+    """Long-polls the events endpoint of the account, each poll returns once something changed or it times out"""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        account: PetkitAccount,
+        on_device_event: Callable[[int], None],
+        on_available_changed: Callable[[bool], None]
+    ):
+        super().__init__(hass, entry, on_device_event, on_available_changed)
+        self._account = account
+        self._timeout = aiohttp.ClientTimeout(total=EVENTS_LONG_POLL_TIMEOUT + 10)
+
+    async def _async_run(self):
+        cursor = None
+        while True:
+            pms = {'timeout': EVENTS_LONG_POLL_TIMEOUT}
+            if cursor is not None:
+                pms['cursor'] = cursor
+            try:
+                rsp = await self._account.request(EVENTS_ENDPOINT, pms, timeout=self._timeout)
+            except PetkitConnectionError as exc:
+                #the API is unreachable for now, try again later
+                _LOGGER.debug("Petkit event poll failed: %s", exc)
+                self._set_available(False)
+                await asyncio.sleep(EVENT_RECONNECT_DELAY)
+                continue
+            except PetkitEndpointNotFoundError:
+                self._stop("the API does not offer device events")
+                return
+            except PetkitError as exc:
+                self._stop(exc)
+                return
+
+            result = rsp.get('result')
+            if not isinstance(result, dict):
+                self._stop(rsp.get('error') or 'unexpected response')
+                return
+
+            self._set_available(True)
+            cursor = result.get('cursor', cursor)
+            for evt in result.get('events') or []:
+                device_id = evt.get('deviceId') if isinstance(evt, dict) else None
+                if device_id is not None:
+                    self._on_device_event(device_id)
+
+    def _stop(self, reason):
+        #polling keeps working, no point in asking again until the entry is reloaded
+        _LOGGER.warning("Petkit device events disabled, polling instead: %s", reason)
+        self._set_available(False)
@@ -0,0 +1,186 @@
+"""Compact history of device metrics, kept off the entity attributes"""
+
+from array import array
+import base64
+from datetime import timedelta
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    HISTORY_REPEAT_INTERVAL,
+    HISTORY_RETENTION_DAYS,
+    HISTORY_SAVE_DELAY,
+    STORAGE_KEY_HISTORY,
+    STORAGE_VERSION
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PERIODS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+class MetricSeries:
+    """Append-only column pair of unix timestamps and values"""
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, timestamps: Optional[array] = None, values: Optional[array] = None):
+        self.timestamps = timestamps if timestamps is not None else array('q')
+        self.values = values if values is not None else array('d')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, value: float) -> bool:
+        """Add a sample newer than the last one, an unchanged value is only repeated once in a while"""
+        if self.timestamps:
+            last = self.timestamps[-1]
+            if timestamp <= last:
+                return False
+            if value == self.values[-1] and timestamp - last < HISTORY_REPEAT_INTERVAL:
+                return False
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+        return True
+
+    def prune(self, before: int):
+        idx = self._index(before)
+        if idx:
+            del self.timestamps[:idx]
+            del self.values[:idx]
+
+    def _index(self, timestamp: int) -> int:
+        """Index of the first sample at or after the timestamp"""
+        lo, hi = 0, len(self.timestamps)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[mid] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def aggregate(self, start: int, end: int) -> Optional[Dict[str, Any]]:
+        """count, min, max, mean and last value of the samples in [start, end)"""
+        lo, hi = self._index(start), self._index(end)
+        if lo >= hi:
+            return None
+        values = self.values[lo:hi]
+        return {
+            'count': len(values),
+            'min': min(values),
+            'max': max(values),
+            'mean': sum(values) / len(values),
+            'last': values[-1],
+        }
+
+    def export(self) -> Dict[str, str]:
+        return {
+            't': base64.b64encode(self.timestamps.tobytes()).decode(),
+            'v': base64.b64encode(self.values.tobytes()).decode(),
+        }
+
+    @classmethod
+    def restore(cls, data: Dict[str, str], byteorder: str):
+        timestamps, values = array('q'), array('d')
+        timestamps.frombytes(base64.b64decode(data['t']))
+        values.frombytes(base64.b64decode(data['v']))
+        if byteorder != sys.byteorder:
+            timestamps.byteswap()
+            values.byteswap()
+        return cls(timestamps, values)
+
+class PetkitHistory:
+    """Metric series per device of a config entry, persisted to disk"""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_HISTORY.format(entry_id=entry_id))
+        self._series: Dict[Tuple[str, str], MetricSeries] = {}
+        self._save_pending = False
+
+    async def async_load(self):
+        data = await self._store.async_load() or {}
+        byteorder = data.get('byteorder', sys.byteorder)
+        for device_id, metrics in (data.get('series') or {}).items():
+            for metric, series in metrics.items():
+                try:
+                    self._series[(device_id, metric)] = MetricSeries.restore(series, byteorder)
+                except (KeyError, TypeError, ValueError) as exc:
+                    _LOGGER.warning("Dropping unreadable Petkit history of %s %s: %s", device_id, metric, exc)
+
+    def _get_data(self) -> Dict[str, Any]:
+        self._prune()
+        series = {}
+        for (device_id, metric), ser in self._series.items():
+            series.setdefault(device_id, {})[metric] = ser.export()
+        return {
+            'byteorder': sys.byteorder,
+            'series': series,
+        }
+
+    def _prune(self):
+        before = int(time.time()) - HISTORY_RETENTION_DAYS * 86400
+        for ser in self._series.values():
+            ser.prune(before)
+
+    def record(self, device_id, samples: List[Tuple[str, Optional[int], Any]]):
+        """Append (metric, timestamp or None for now, value) samples of a device, non-numeric values are skipped"""
+        now = int(time.time())
+        added = False
+        for metric, timestamp, value in samples:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            key = (str(device_id), metric)
+            if key not in self._series:
+                self._series[key] = MetricSeries()
+            added |= self._series[key].append(timestamp or now, float(value))
+        if added:
+            self._save_pending = True
+            self._store.async_delay_save(self._get_data, HISTORY_SAVE_DELAY)
+
+    async def async_flush(self):
+        """Write pending samples now, a reload would lose them and a delayed save would outlive the entry"""
+        if self._save_pending:
+            self._save_pending = False
+            await self._store.async_save(self._get_data())
+
+    def metrics(self, device_id) -> List[str]:
+        return sorted(metric for id, metric in self._series if id == str(device_id))
+
+    def query(self, device_id, metric: str, period: str = 'day', days: int = 7) -> List[Dict[str, Any]]:
+        """Aggregates per local day or week, oldest first, over the last `days` days"""
+        ser = self._series.get((str(device_id), metric))
+        if ser is None:
+            return []
+
+        step = PERIODS[period]
+        start = dt_util.start_of_local_day(dt_util.now() - timedelta(days=days - 1))
+        if period == 'week':
+            start = dt_util.start_of_local_day(start.date() - timedelta(days=start.weekday()))
+
+        buckets = []
+        end_of_range = dt_util.now()
+        while start <= end_of_range:
+            #local midnights, so the buckets follow daylight saving changes
+            end = dt_util.start_of_local_day(start + step + timedelta(hours=12))
+            agg = ser.aggregate(int(start.timestamp()), int(end.timestamp()))
+            if agg:
+                buckets.append({'start': start.isoformat(), **agg})
+            start = end
+        return buckets
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'series': len(self._series),
+            'samples': sum(len(ser) for ser in self._series.values()),
+        }
+
+    async def async_remove(self):
+        await self._store.async_remove()
@@ -0,0 +1,87 @@
+"""Domain-wide scheduling of the Petkit accounts of all config entries"""
+
+import logging
+from typing import Dict, Set
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+
+from .api import REGION_RATE_BURST, REGION_RATE_LIMIT
+from .api.breaker import CircuitBreaker
+from .api.ratelimit import TokenBucket
+from .const import DATA_SCHEDULER
+from .session import create_petkit_session
+
+_LOGGER = logging.getLogger(__name__)
+
+#successive multiples of the golden ratio spread evenly over [0, 1) without knowing the number of accounts
+_GOLDEN_RATIO = 0.6180339887
+
+class PetkitScheduler:
+    """Staggers the polls of the accounts, and shares a connection pool, request budget and circuit breaker per region"""
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._slots: Dict[str, int] = {}
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._session_unsubs = {}
+        self._session_users: Dict[str, Set[str]] = {}
+        self._rate_limiters: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def poll_offset(self, entry_id: str, interval: float) -> float:
+        """Seconds the polls of the entry are shifted by, so accounts do not poll at the same time"""
+        if entry_id not in self._slots:
+            used = set(self._slots.values())
+            self._slots[entry_id] = next(i for i in range(len(used) + 1) if i not in used)
+        return (self._slots[entry_id] * _GOLDEN_RATIO % 1) * interval
+
+    def acquire_session(self, entry_id: str, region: str) -> aiohttp.ClientSession:
+        """The connection pool of the region, shared by every account in it"""
+        session = self._sessions.get(region)
+        if session is None or session.closed:
+            session, self._session_unsubs[region] = create_petkit_session(self._hass, region)
+            self._sessions[region] = session
+        self._session_users.setdefault(region, set()).add(entry_id)
+        return session
+
+    def rate_limiter(self, region: str) -> TokenBucket:
+        """The request budget of the region endpoint, shared by every account in it"""
+        if region not in self._rate_limiters:
+            self._rate_limiters[region] = TokenBucket(region, REGION_RATE_LIMIT, REGION_RATE_BURST)
+        return self._rate_limiters[region]
+
+    def circuit_breaker(self, region: str) -> CircuitBreaker:
+        """Pauses the requests of every account in the region while its API is unreachable"""
+        if region not in self._breakers:
+            self._breakers[region] = CircuitBreaker(region)
+        return self._breakers[region]
+
+    async def async_release(self, entry_id: str, region: str):
+        """Give up the slot and session of an entry, closing the session once nobody uses it"""
+        self._slots.pop(entry_id, None)
+        users = self._session_users.get(region, set())
+        users.discard(entry_id)
+        if users:
+            return
+
+        self._session_users.pop(region, None)
+        session = self._sessions.pop(region, None)
+        if unsub := self._session_unsubs.pop(region, None):
+            unsub()
+        if session is not None:
+            _LOGGER.debug("Closing Petkit HTTP session for region %s", region)
+            await session.close()
+
+    def as_dict(self) -> dict:
+        return {
+            'slots': dict(self._slots),
+            'sessions': {region: sorted(users) for region, users in self._session_users.items()},
+            'circuit_breakers': {region: breaker.as_dict() for region, breaker in self._breakers.items()},
+        }
+
+def get_scheduler(hass: HomeAssistant) -> PetkitScheduler:
+    if DATA_SCHEDULER not in hass.data:
+        hass.data[DATA_SCHEDULER] = PetkitScheduler(hass)
+    return hass.data[DATA_SCHEDULER]
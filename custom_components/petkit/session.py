@@ -0,0 +1,49 @@
+"""HTTP sessions dedicated to the Petkit API"""
+
+import logging
+from typing import Callable, Tuple
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.util import ssl as ssl_util
+
+from .api import (
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    REQUEST_TIMEOUT
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+def create_petkit_session(hass: HomeAssistant, region: str) -> Tuple[aiohttp.ClientSession, Callable[[], None]]:
+    """Create a session with its own keep-alive connection pool for a Petkit region
+
+    Returns the session and a function that stops closing it with Home Assistant,
+    to be called when the session is closed by its owner instead.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+        enable_cleanup_closed=True,
+        ssl=ssl_util.client_context(),
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        headers={aiohttp.hdrs.ACCEPT_ENCODING: 'gzip, deflate'},
+        auto_decompress=True,
+    )
+    _LOGGER.debug("Created Petkit HTTP session for region %s", region)
+
+    @callback
+    def _async_close(event: Event):
+        hass.async_create_task(session.close())
+
+    unsub = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return session, unsub
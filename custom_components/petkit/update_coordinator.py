@@ -2,8 +2,9 @@
 
 import asyncio
 import async_timeout
-from datetime import timedelta
+from datetime import timedelta, timezone
 import logging
+import time
 from typing import Any, Dict, List
 
 from homeassistant.config_entries import ConfigEntry
@@ -14,26 +15,51 @@ from homeassistant.const import (
     CONF_SCAN_INTERVAL, 
     CONF_TIMEOUT
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
-from homeassistant.helpers import aiohttp_client
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .api import (
+    DEVICE_ROSTER_ENDPOINT,
     PetkitAccount, 
     PetkitError, 
     PetkitAuthFailedError, 
-    PetkitServerError
+    PetkitServerError,
+    summarize_payload
 )
 
 from .const import (
+    CACHE_SAVE_DELAY,
+    CONF_ATTRIBUTE_BUDGET,
+    CONF_EVENT_MODE,
+    CONF_MAX_PARALLEL,
+    DEBUG_PAYLOAD_SAMPLE_EVERY,
+    DEFAULT_ATTRIBUTE_BUDGET,
+    DEFAULT_EVENT_MODE,
+    DEFAULT_MAX_PARALLEL,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_TIMEOUT,
-    DOMAIN
+    DOMAIN,
+    EVENT_MODE_POLL_INTERVAL,
+    SIGNAL_DEVICE_UPDATED,
+    STORAGE_KEY_CACHE,
+    STORAGE_KEY_SESSION,
+    STORAGE_VERSION
 )
 from .devices import PetkitDevice, get_device_type
+from .events import LongPollEventSource, PetkitEventSource
+from .history import PetkitHistory
+from .scheduler import get_scheduler
 
 PLATFORMS = ["sensor","switch","select","button","binary_sensor","number"]
+#devices due within this many seconds are fetched on the current refresh
+POLL_TOLERANCE = 1
+#devices whose roster entry did not change are still refetched after this many seconds,
+#unless their sensors read the detail, then it is refetched at their poll interval
+DETAIL_MAX_AGE = 600
 _LOGGER = logging.getLogger(__name__)
 
 class PetkitUpdateCoordinator(DataUpdateCoordinator):
@@ -43,18 +69,50 @@ class PetkitUpdateCoordinator(DataUpdateCoordinator):
         """Set up the PetkitUpdateCoordinator class."""
         self._hass = hass
         self._config_entry = config_entry 
-        self._session = aiohttp_client.async_get_clientsession(hass)
-        
         self._username = config_entry.data[CONF_USERNAME]
         self._password = config_entry.data[CONF_PASSWORD]
         self._region = config_entry.data[CONF_REGION]
-        self._api = PetkitAccount(self._session, self._username, self._password, self._region)
+        #accounts of the same region share a connection pool and request budget
+        self._scheduler = get_scheduler(hass)
+        self._session = self._scheduler.acquire_session(config_entry.entry_id, self._region)
+        self._api = PetkitAccount(
+            self._session, self._username, self._password, self._region,
+            rate_limiter=self._scheduler.rate_limiter(self._region),
+            circuit_breaker=self._scheduler.circuit_breaker(self._region)
+        )
 
         options = config_entry.options
         self._update_interval = options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
         self._timeout = options.get(CONF_TIMEOUT, DEFAULT_TIMEOUT)
+        self._max_parallel = options.get(CONF_MAX_PARALLEL, DEFAULT_MAX_PARALLEL)
+        #taken per request, a litter box fetches its detail and records at the same time
+        self.request_slots = asyncio.Semaphore(max(1, self._max_parallel))
+        self._event_mode = options.get(CONF_EVENT_MODE, DEFAULT_EVENT_MODE)
+        self._event_source: PetkitEventSource = None
+        self.attribute_budget = options.get(CONF_ATTRIBUTE_BUDGET, DEFAULT_ATTRIBUTE_BUDGET)
+        self.trimmed_attributes = 0
+        #shifts the polls of this account once, away from the other accounts
+        self._poll_offset = self._scheduler.poll_offset(config_entry.entry_id, self._update_interval)
         self._initialized = False
         self.devices: dict[str, PetkitDevice] = {}
+        self._next_detail_update: dict[str, float] = {}
+        self._last_detail_update: dict[str, float] = {}
+        self.changed_devices: set[str] = set()
+        self.suppressed_writes = 0
+        self.last_refresh_duration: float = None
+        self.detail_durations: dict[str, float] = {}
+        self._refresh_count = 0
+        self._unsub_dispatch = None
+        self._last_dispatched_success = None
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_CACHE.format(entry_id=config_entry.entry_id))
+        self._cache_save_pending = False
+        self._session_store = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY_SESSION.format(entry_id=config_entry.entry_id), private=True
+        )
+        self._unsub_session_renewal = None
+        self.history = PetkitHistory(hass, config_entry.entry_id)
+        self._unsub_history = None
+        self._api.on_session_changed = self._async_session_changed
 
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=timedelta(seconds=self._update_interval))
 
@@ -62,13 +120,50 @@ class PetkitUpdateCoordinator(DataUpdateCoordinator):
     def api(self):
         return self._api
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        #every new roster starts a new generation, invalidating the values the devices derived from it
+        self._data = value
+        self._data_generation = getattr(self, '_data_generation', 0) + 1
+
+    @property
+    def data_generation(self) -> int:
+        return self._data_generation
+
     async def async_setup(self):
         """Setup a new coordinator"""
         _LOGGER.debug("Setting up coordinator")
+        try:
+            return await self._async_setup()
+        except BaseException:
+            #e.g. ConfigEntryNotReady from the first refresh, async_reset is not called for a failed setup
+            _LOGGER.debug("Coordinator setup failed, releasing its resources")
+            await self._async_release()
+            raise
 
-        _LOGGER.debug("Getting first refresh")
-        await self.async_config_entry_first_refresh()
-        self._initialized = True
+    async def _async_setup(self):
+        if self._api.restore_session(await self._session_store.async_load()):
+            self._schedule_session_renewal()
+
+        await self.history.async_load()
+
+        #entities listen per device, the coordinator itself is the only listener
+        self._unsub_dispatch = self.async_add_listener(self._async_dispatch_updates)
+        self._unsub_history = self.async_add_listener(self._async_record_history)
+
+        if await self._async_restore_cache():
+            #entities are built from the cache, reconcile with the cloud in the background
+            _LOGGER.debug("Restored devices from cache, refreshing in the background")
+            self._initialized = True
+            self.hass.async_create_task(self.async_refresh())
+        else:
+            _LOGGER.debug("Getting first refresh")
+            await self.async_config_entry_first_refresh()
+            self._initialized = True
 
         _LOGGER.debug("Forwarding setup to platforms")
         for component in PLATFORMS:
@@ -78,11 +173,19 @@ class PetkitUpdateCoordinator(DataUpdateCoordinator):
                 )
             )
 
+        if self._event_mode:
+            self._event_source = LongPollEventSource(
+                self.hass, self._config_entry, self._api, self._async_device_event, self._async_event_source_changed
+            )
+            await self._event_source.async_start()
+
         return True
 
     async def async_reset(self):
         """Resets the coordinator."""
         _LOGGER.debug("resetting the coordinator")
+        await self._async_release()
+
         entry = self._config_entry
         unload_ok = all(
             await asyncio.gather(
@@ -96,22 +199,151 @@ class PetkitUpdateCoordinator(DataUpdateCoordinator):
         )
         return unload_ok
 
+    async def _async_release(self):
+        """Stops timers, listeners and the event source, flushes the cache and gives back the shared session"""
+        if self._unsub_session_renewal:
+            self._unsub_session_renewal()
+            self._unsub_session_renewal = None
+        if self._unsub_dispatch:
+            self._unsub_dispatch()
+            self._unsub_dispatch = None
+        if self._unsub_history:
+            self._unsub_history()
+            self._unsub_history = None
+        if self._event_source:
+            await self._event_source.async_stop()
+            self._event_source = None
+        for dvc in self.devices.values():
+            dvc.async_cancel_pending()
+        await self._async_flush_cache()
+        await self.history.async_flush()
+        await self._scheduler.async_release(self._config_entry.entry_id, self._region)
+
+    @property
+    def events_available(self) -> bool:
+        return self._event_source is not None and self._event_source.available
+
+    @callback
+    def _async_device_event(self, device_id):
+        """A device reported a change, refresh it, or the roster for a device we do not know yet"""
+        dvc = self.devices.get(device_id)
+        if dvc is None:
+            self.hass.async_create_task(self.async_request_refresh())
+            return
+        #bursts of events share one refresh
+        self.hass.async_create_task(dvc.async_request_refresh())
+
+    @callback
+    def _async_event_source_changed(self, available: bool):
+        """Switch between the slow safety poll and regular polling"""
+        self._schedule_device_updates([], time.monotonic())
+        if not available:
+            #catch up on whatever was missed while the events stopped
+            self.hass.async_create_task(self.async_request_refresh())
+
+    def device_signal(self, device_id: str) -> str:
+        """Dispatcher signal sent when the given device was updated"""
+        return SIGNAL_DEVICE_UPDATED.format(entry_id=self._config_entry.entry_id, device_id=device_id)
+
+    @callback
+    def _async_dispatch_updates(self):
+        """Notify the entities of the devices that changed, or of all devices if availability flipped"""
+        if self.last_update_success != self._last_dispatched_success:
+            ids = list(self.devices)
+        else:
+            ids = [id for id in self.changed_devices if id in self.devices]
+        self._last_dispatched_success = self.last_update_success
+
+        for id in ids:
+            async_dispatcher_send(self.hass, self.device_signal(id))
+
+    @callback
+    def _async_record_history(self):
+        if not self.last_update_success:
+            return
+        for id, dvc in self.devices.items():
+            self.history.record(id, dvc.history_samples())
+
+    @callback
+    def _async_session_changed(self):
+        """Persist the new session and schedule its renewal"""
+        self._session_store.async_delay_save(lambda: self._api.session_data, 0)
+        self._schedule_session_renewal()
+
+    @callback
+    def _schedule_session_renewal(self):
+        if self._unsub_session_renewal:
+            self._unsub_session_renewal()
+            self._unsub_session_renewal = None
+
+        renew_at = self._api.renew_at
+        if renew_at is None:
+            return
+        _LOGGER.debug("Scheduling Petkit session renewal at %s", renew_at)
+        self._unsub_session_renewal = async_track_point_in_utc_time(
+            self.hass, self._async_renew_session, renew_at.replace(tzinfo=timezone.utc)
+        )
+
+    async def _async_renew_session(self, _now):
+        self._unsub_session_renewal = None
+        try:
+            await self._api.async_login()
+        except PetkitError as err:
+            #the request path logs in again once the session actually expires
+            _LOGGER.warning("Background renewal of the Petkit session failed: %s", err)
+
+    async def _async_restore_cache(self) -> bool:
+        """Build the devices from the last good roster and details saved on disk"""
+        cached = await self._store.async_load()
+        roster = (cached or {}).get("roster") or []
+        if not roster:
+            return False
+
+        data = { x["id"]: x for x in roster }
+        self.data = data
+        await self._build_devices(data)
+
+        states = cached.get("devices") or {}
+        for id, dvc in self.devices.items():
+            if state := states.get(str(id)):
+                dvc.restore_state(state)
+        return True
+
+    def _async_save_cache(self):
+        self._cache_save_pending = True
+        self._store.async_delay_save(self._get_cache_data, CACHE_SAVE_DELAY)
+
+    async def _async_flush_cache(self):
+        #writes now and cancels the delayed save, which would otherwise recreate the file after the entry is removed
+        if self._cache_save_pending:
+            self._cache_save_pending = False
+            await self._store.async_save(self._get_cache_data())
+
+    def _get_cache_data(self) -> dict[str, Any]:
+        return {
+            "roster": list((self.data or {}).values()),
+            "devices": {
+                str(id): dvc.export_state()
+                for id, dvc in self.devices.items()
+            }
+        }
+
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
         try:
             data = {}
+            self.changed_devices = set()
+            start = time.monotonic()
 
             #get the list of known appliances
             existing_devices: list[str] = self.devices.keys()
             
             async with async_timeout.timeout(self._timeout):
                 response = await self._api.get_devices()
-                _LOGGER.debug(f"Received Petkit device update: {response}")
+                data = self._merge_roster(response)
 
-                data = { 
-                    x["data"]["id"]: x["data"] | { "type": x["type"] }
-                    for x in response
-                }
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                self._log_roster(response)
 
             #build the device list if needed
             if not self._initialized:
@@ -120,16 +352,143 @@ class PetkitUpdateCoordinator(DataUpdateCoordinator):
                 #detect new devices and notify the user
                 await self._detect_new_devices(existing_devices, data)
 
-                #get additional detail per device
-                for dvc in self.devices.values():
-                    await dvc.update_device_detail()
+                #expose the new roster before scheduling, the poll tiers are derived from it
+                self.data = data
+
+                #get additional detail per device that is due
+                now = time.monotonic()
+                due = [
+                    dvc for id, dvc in self.devices.items()
+                    if self._next_detail_update.get(id, 0) <= now + POLL_TOLERANCE
+                    and (id in self.changed_devices or self._is_detail_stale(dvc, now))
+                ]
+                await self._update_device_details(due)
+                self._schedule_device_updates(due, now)
 
+            if self._poll_offset:
+                #the next refresh schedules from the new phase, later ones keep it
+                _LOGGER.debug("Staggering Petkit polls of this account by %.1f seconds", self._poll_offset)
+                self.update_interval += timedelta(seconds=self._poll_offset)
+                self._poll_offset = 0
+
+            self.last_refresh_duration = time.monotonic() - start
+            self._async_save_cache()
             return data
         except (PetkitAuthFailedError) as ex:
             raise ConfigEntryAuthFailed from ex            
         except PetkitError as err:
             raise UpdateFailed(f"Error communicating with API: {err}")
 
+    async def _update_device_details(self, devices: list[PetkitDevice]):
+        """Fetch the detail of the given devices, the requests take one of the max_parallel request slots each"""
+        async def _update(dvc: PetkitDevice):
+            previous = dvc.detail
+            start = time.monotonic()
+            detail = await dvc.update_device_detail()
+            self._last_detail_update[dvc.id] = time.monotonic()
+            #timings change on every fetch, they are only in the diagnostics
+            self.detail_durations[dvc.id] = self._last_detail_update[dvc.id] - start
+            if detail != previous:
+                self.changed_devices.add(dvc.id)
+
+        await asyncio.gather(*[_update(dvc) for dvc in devices])
+
+    async def async_refresh_device(self, device_id: str):
+        """Refresh the detail and records of a single device and notify only its entities"""
+        dvc = self.devices.get(device_id)
+        if dvc is None:
+            return
+        try:
+            await self._update_device_details([dvc])
+        except PetkitError as err:
+            _LOGGER.warning("Refreshing Petkit device %s failed: %s", dvc.name, err)
+            return
+
+        #fold the live detail into the roster entry, until the next roster poll replaces it
+        if self.data and device_id in self.data:
+            self.data = {**self.data, device_id: dvc.merge_detail_into_roster(self.data[device_id])}
+
+        #only notify this device, without disturbing a full refresh that may be in flight
+        changed = self.changed_devices
+        self.changed_devices = {device_id}
+        self.async_update_listeners()
+        self.changed_devices = changed
+
+    def _log_roster(self, response: list[dict]):
+        """Log a summary of the roster, and a sampled truncated payload"""
+        self._refresh_count += 1
+        stats = self._api.metrics.get(DEVICE_ROSTER_ENDPOINT)
+        _LOGGER.debug(
+            "Received Petkit device update: %d devices, %d bytes, changed=%s",
+            len(response), stats.last_bytes if stats else 0, sorted(self.changed_devices)
+        )
+        if self._refresh_count % DEBUG_PAYLOAD_SAMPLE_EVERY == 1:
+            _LOGGER.debug("Petkit device roster payload: %s", summarize_payload(response))
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Refresh, device and API metrics, for diagnostics"""
+        return {
+            "region": self._region,
+            "update_interval": self.update_interval.total_seconds() if self.update_interval else None,
+            "last_refresh_duration": self.last_refresh_duration,
+            "suppressed_writes": self.suppressed_writes,
+            "trimmed_attributes": self.trimmed_attributes if self.attribute_budget else None,
+            "scheduler": self._scheduler.as_dict(),
+            "events_available": self.events_available if self._event_mode else None,
+            "history": self.history.as_dict(),
+            "devices": {
+                str(id): {
+                    "type": dvc.type,
+                    "poll_tier": dvc.poll_tier,
+                    "detail_duration": self.detail_durations.get(id),
+                    "command_latency": dvc.last_command_latency,
+                }
+                for id, dvc in self.devices.items()
+            },
+            "api": self._api.metrics.as_dict(),
+        }
+
+    def _merge_roster(self, response: list[dict]) -> dict[str, Any]:
+        """Build the device data, keeping the previous dict of every device whose entry did not change"""
+        previous = self.data or {}
+        data = {}
+        for x in response:
+            entry = x["data"] | { "type": x["type"] }
+            id = entry["id"]
+            if previous.get(id) == entry:
+                data[id] = previous[id]
+            else:
+                data[id] = entry
+                self.changed_devices.add(id)
+        return data
+
+    def _schedule_device_updates(self, updated: list[PetkitDevice], now: float):
+        """Schedule the next detail fetch of each device and tick at the fastest cadence"""
+        for dvc in updated:
+            self._next_detail_update[dvc.id] = now + dvc.get_poll_interval(self._update_interval)
+
+        intervals = [
+            dvc.get_poll_interval(self._update_interval)
+            for dvc in self.devices.values()
+        ]
+        interval = min(intervals + [self._update_interval])
+        if self.events_available:
+            #devices report their changes, the roster poll only guards against missed events
+            interval = max(interval, EVENT_MODE_POLL_INTERVAL)
+        if self.update_interval != timedelta(seconds=interval):
+            _LOGGER.debug("Adjusting Petkit update interval to %s seconds", interval)
+            self.update_interval = timedelta(seconds=interval)
+
+    def _is_detail_stale(self, dvc: PetkitDevice, now: float) -> bool:
+        last = self._last_detail_update.get(dvc.id)
+        if last is None:
+            return True
+        if dvc.DETAIL_SENSORS:
+            max_age = dvc.get_poll_interval(self._update_interval)
+        else:
+            max_age = DETAIL_MAX_AGE
+        return last + max_age <= now + POLL_TOLERANCE
+
     async def _build_devices(self, data: dict[str,Any]):
         for id, device_data in data.items():
             _LOGGER.info(f"Found Petkit device with id={id}, setting up...")
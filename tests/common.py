@@ -0,0 +1,60 @@
+"""Helpers shared by the tests, which run against the local stand-in cloud of the benchmarks"""
+
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+import aiohttp
+
+from homeassistant.const import CONF_PASSWORD, CONF_REGION, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.petkit.api import PetkitAccount
+from custom_components.petkit.update_coordinator import PetkitUpdateCoordinator
+
+from bench.fake_cloud import FakePetkitCloud
+
+def run(coro):
+    return asyncio.run(coro)
+
+def create_hass(config_dir: str) -> HomeAssistant:
+    try:
+        return HomeAssistant(config_dir)
+    except TypeError:
+        #older Home Assistant releases take no arguments
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+        return hass
+
+def create_entry(options: dict = None):
+    return SimpleNamespace(
+        entry_id='test',
+        data={CONF_USERNAME: 'test', CONF_PASSWORD: 'test', CONF_REGION: 'US'},
+        options=options or {},
+    )
+
+async def with_account(cloud: FakePetkitCloud, test):
+    """Await test(account) with an account of its own talking to the started cloud"""
+    base_url = await cloud.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            account = PetkitAccount(session, 'test', 'test', 'US', api_base_url=base_url, rate_limits={})
+            return await test(account)
+    finally:
+        await cloud.stop()
+
+async def with_coordinator(cloud: FakePetkitCloud, test, options: dict = None):
+    """Await test(coordinator) with a coordinator whose account talks to the started cloud"""
+    base_url = await cloud.start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = create_hass(config_dir)
+        entry = create_entry(options)
+        coordinator = PetkitUpdateCoordinator(hass, entry)
+        try:
+            coordinator._api = PetkitAccount(
+                coordinator._session, 'test', 'test', 'US', api_base_url=base_url, rate_limits={}
+            )
+            return await test(coordinator)
+        finally:
+            await coordinator._scheduler.async_release(entry.entry_id, 'US')
+            await cloud.stop()
@@ -0,0 +1,150 @@
+"""PetkitAccount requests and rate limits, against the local stand-in cloud of the benchmarks"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('homeassistant')
+aiohttp = pytest.importorskip('aiohttp')
+
+from custom_components.petkit.api import (
+    DEVICE_ROSTER_ENDPOINT,
+    PetkitAuthFailedError,
+    PetkitCircuitOpenError,
+    PetkitConnectionError
+)
+from custom_components.petkit.api.breaker import CircuitBreaker
+from custom_components.petkit.api.const import REQUEST_RETRIES
+from custom_components.petkit.api.ratelimit import RateLimiter, TokenBucket
+
+from bench.fake_cloud import FakePetkitCloud
+
+from .common import run, with_account
+
+#shorter than the latency of the stand-in cloud, every request times out
+TIMEOUT = aiohttp.ClientTimeout(total=0.1)
+
+def test_request_returns_result():
+    async def test(account):
+        return await account._request(DEVICE_ROSTER_ENDPOINT)
+
+    cloud = FakePetkitCloud(devices=3, latency=0)
+    rsp = run(with_account(cloud, test))
+    assert len(rsp['result']['devices']) == 3
+    assert cloud.requests['discovery/device_roster'] == 1
+
+def test_request_retries_reads():
+    async def test(account):
+        with pytest.raises(PetkitConnectionError):
+            await account._request(DEVICE_ROSTER_ENDPOINT, timeout=TIMEOUT)
+
+    cloud = FakePetkitCloud(devices=1, latency=1)
+    run(with_account(cloud, test))
+    assert cloud.requests['discovery/device_roster'] == 1 + REQUEST_RETRIES
+
+def test_request_retries_server_errors():
+    async def test(account):
+        with pytest.raises(PetkitConnectionError):
+            await account._request(DEVICE_ROSTER_ENDPOINT)
+
+    cloud = FakePetkitCloud(devices=1, latency=0, http_error_rate=1)
+    run(with_account(cloud, test))
+    assert cloud.requests['discovery/device_roster'] == 1 + REQUEST_RETRIES
+
+def test_request_never_retries_control_commands():
+    async def test(account):
+        with pytest.raises(PetkitConnectionError):
+            await account._request('t3/controlDevice', {'id': 100005}, timeout=TIMEOUT)
+
+    cloud = FakePetkitCloud(devices=1, latency=1)
+    run(with_account(cloud, test))
+    assert cloud.requests['{type}/controlDevice'] == 1
+
+def test_request_opens_circuit():
+    async def test(account):
+        #the second call fails the threshold, nothing is retried once the circuit is open
+        for _ in range(2):
+            with pytest.raises(PetkitConnectionError):
+                await account._request(DEVICE_ROSTER_ENDPOINT, timeout=TIMEOUT)
+        sent = cloud.request_count
+        with pytest.raises(PetkitCircuitOpenError):
+            await account._request(DEVICE_ROSTER_ENDPOINT, timeout=TIMEOUT)
+        return sent
+
+    cloud = FakePetkitCloud(devices=1, latency=1)
+    sent = run(with_account(cloud, test))
+    assert cloud.request_count == sent
+
+def test_login_is_single_flight():
+    async def test(account):
+        await asyncio.gather(*[account.async_login() for _ in range(5)])
+        return account.token
+
+    cloud = FakePetkitCloud(devices=1, latency=0.05)
+    assert run(with_account(cloud, test))
+    assert cloud.requests['user/login'] == 1
+
+def test_login_backs_off_after_failure():
+    async def test(account):
+        #the second attempt fails without asking the API again
+        for _ in range(2):
+            with pytest.raises(PetkitAuthFailedError):
+                await account.async_login()
+
+    cloud = FakePetkitCloud(devices=1, latency=0, error_rate=1)
+    run(with_account(cloud, test))
+    assert cloud.requests['user/login'] == 1
+
+def test_circuit_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker('test', threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    #a failed trial opens the circuit for another timeout, a successful one closes it
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+
+def test_token_bucket_serves_priority_first():
+    async def test():
+        bucket = TokenBucket('test', rate=10, capacity=1)
+        await bucket.acquire()
+        done = []
+
+        async def acquire(name, priority):
+            await bucket.acquire(priority)
+            done.append(name)
+
+        background = asyncio.ensure_future(acquire('background', False))
+        await asyncio.sleep(0)
+        control = asyncio.ensure_future(acquire('control', True))
+        await asyncio.gather(background, control)
+        return done
+
+    assert run(test()) == ['control', 'background']
+
+def test_rate_limiter_buckets_per_endpoint_class():
+    async def test():
+        limiter = RateLimiter('test', {'detail': (10, 1), 'control': (10, 1)})
+        await limiter.acquire('t3/device_detail')
+        detail = await limiter.acquire('t3/device_detail')
+        control = await limiter.acquire('t3/controlDevice')
+        #the roster has no limit of its own here
+        roster = await limiter.acquire(DEVICE_ROSTER_ENDPOINT)
+        return detail, control, roster
+
+    detail, control, roster = run(test())
+    assert detail > 0
+    assert control == 0
+    assert roster == 0
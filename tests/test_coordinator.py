@@ -0,0 +1,169 @@
+"""Coordinator roster merging, dispatch, write suppression, cache and litter records, against the local stand-in cloud of the benchmarks"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('homeassistant')
+pytest.importorskip('aiohttp')
+
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+
+from custom_components.petkit.devices import T3LitterDevice
+from custom_components.petkit.update_coordinator import PetkitUpdateCoordinator
+
+from bench.fake_cloud import FakePetkitCloud
+
+from .common import create_entry, run, with_coordinator
+
+def _litter_box(coordinator: PetkitUpdateCoordinator) -> T3LitterDevice:
+    data = {'id': 100005, 'name': 'T3 5', 'type': 't3', 'state': 1, 'status': {}}
+    return T3LitterDevice(data, coordinator, coordinator.api)
+
+def _connect_entities(coordinator: PetkitUpdateCoordinator) -> list:
+    """Wake the entities through the per-device signals, as they subscribe once added to Home Assistant"""
+    entities = [e for dvc in coordinator.devices.values() for e in dvc.entities]
+    for entity in entities:
+        async_dispatcher_connect(
+            coordinator.hass, coordinator.device_signal(entity._device.id), entity._handle_device_update
+        )
+    return entities
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Devices of the entity states written, instead of sending them to the state machine"""
+    written = []
+    monkeypatch.setattr(Entity, 'async_write_ha_state', lambda self: written.append(self._device.id))
+    return written
+
+def _record(timestamp, event_type=10, **content):
+    return {'timestamp': timestamp, 'eventType': event_type, 'content': content or {'petWeight': 4200}}
+
+def test_merge_roster_keeps_unchanged_entries():
+    cloud = FakePetkitCloud(devices=3, latency=0, change_rate=0)
+
+    async def test(coordinator):
+        roster = await coordinator.api.get_devices()
+        coordinator.data = coordinator._merge_roster(roster)
+        assert coordinator.changed_devices == {100000, 100001, 100002}
+
+        coordinator.changed_devices.clear()
+        previous = coordinator.data
+        cloud._devices[1]['data']['status'] = {'food': 0}
+        coordinator.data = coordinator._merge_roster(await coordinator.api.get_devices())
+
+        assert coordinator.changed_devices == {100001}
+        assert coordinator.data[100000] is previous[100000]
+        assert coordinator.data[100001]['status'] == {'food': 0}
+        assert coordinator.data[100001]['type'] == 'D4'
+
+    run(with_coordinator(cloud, test))
+
+def test_merge_records_past_high_water():
+    async def test(coordinator):
+        dvc = _litter_box(coordinator)
+        assert len(dvc._merge_records([_record(100), _record(200, 5, result=0)])) == 2
+        assert dvc.records_high_water == 200
+
+        #older records are ignored, a second record in the high-water second is not
+        new = dvc._merge_records([_record(150), _record(200, 5, result=0), _record(200), _record(300)])
+        assert [(rec.timestamp, rec.event_type) for rec in new] == [(200, 10), (300, 10)]
+        assert dvc.records_high_water == 300
+        assert len(dvc.records) == 4
+        assert dvc.pet_weight == 4200
+
+    run(with_coordinator(FakePetkitCloud(devices=0, latency=0), test))
+
+def test_merge_records_keeps_drifted_records():
+    async def test(coordinator):
+        dvc = _litter_box(coordinator)
+        dvc._merge_records([_record(100)])
+
+        #timestamps sent as float or string are still ordered, unreadable ones are kept once
+        new = dvc._merge_records([_record(200.0), _record('300'), _record('soon'), _record('soon')])
+        assert [rec.timestamp for rec in new] == [200, 300, None]
+        assert new[-1].extra == {'timestamp': 'soon'}
+        assert dvc._merge_records([_record('soon')]) == []
+        #the undated record is not the latest one
+        assert dvc.last_record_attrs()['timestamp'] == 300
+
+    run(with_coordinator(FakePetkitCloud(devices=0, latency=0), test))
+
+def test_overlapping_record_fetches_merge_once():
+    cloud = FakePetkitCloud(devices=0, latency=0.05, records=10)
+
+    async def test(coordinator):
+        dvc = _litter_box(coordinator)
+        await asyncio.gather(dvc.update_device_records(), dvc.update_device_records())
+        return dvc
+
+    dvc = run(with_coordinator(cloud, test))
+    assert cloud.requests['{type}/getDeviceRecord'] == 2
+    #the stand-in moves its records along with the clock, the second fetch may add the newest one
+    keys = [(rec.timestamp, rec.event_type) for rec in dvc.records]
+    assert len(keys) >= 10
+    assert len(set(keys)) == len(keys)
+
+def test_dispatch_wakes_only_changed_devices(writes):
+    cloud = FakePetkitCloud(devices=3, latency=0, change_rate=0)
+
+    async def test(coordinator):
+        await coordinator.async_refresh()
+        entities = _connect_entities(coordinator)
+
+        #the first dispatch wakes every device
+        coordinator._async_dispatch_updates()
+        assert set(writes) == set(coordinator.devices)
+
+        writes.clear()
+        coordinator.changed_devices = {100001}
+        coordinator._async_dispatch_updates()
+        assert {e._device.id for e in entities if e.suppressed_writes} == {100001}
+
+    run(with_coordinator(cloud, test))
+
+def test_unchanged_entities_skip_their_write(writes):
+    cloud = FakePetkitCloud(devices=5, latency=0, change_rate=0)
+
+    async def test(coordinator):
+        await coordinator.async_refresh()
+        coordinator._initialized = True
+        entities = {e.unique_id: e for e in _connect_entities(coordinator)}
+        coordinator._async_dispatch_updates()
+        writes.clear()
+
+        #the pump of the fountain stops, its filter keeps its level
+        cloud._devices[4]['data']['status'] = {'runStatus': 0, 'powerStatus': 1}
+        await coordinator.async_refresh()
+        coordinator._async_dispatch_updates()
+
+        assert 100004 in writes
+        assert entities['100004-state'].suppressed_writes == 0
+        assert entities['100004-filter_level'].suppressed_writes == 1
+
+    run(with_coordinator(cloud, test))
+
+def test_cache_restores_devices_and_details():
+    cloud = FakePetkitCloud(devices=6, latency=0, change_rate=0, records=5)
+
+    async def test(coordinator):
+        await coordinator.async_refresh()
+        coordinator._initialized = True
+        await coordinator.async_refresh()
+        coordinator._async_save_cache()
+        await coordinator._async_flush_cache()
+
+        restored = PetkitUpdateCoordinator(coordinator.hass, create_entry())
+        try:
+            assert await restored._async_restore_cache()
+        finally:
+            await restored._scheduler.async_release('test', 'US')
+
+        assert set(restored.devices) == set(coordinator.devices)
+        assert restored.devices[100000].detail == coordinator.devices[100000].detail
+        litter_box = restored.devices[100005]
+        assert litter_box.records_high_water == coordinator.devices[100005].records_high_water
+        assert len(litter_box.records) == 5
+
+    run(with_coordinator(cloud, test))